@@ -1,20 +1,117 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, Response, jsonify, render_template, request, send_file, url_for
 from markupsafe import Markup
-import subprocess
+import io
+import json
 import os
+import tempfile
+import threading
+
+# jobs, incremental, compress, export and fill are imported in the routes
+# that use them, so starting the app only pays for what every request needs
+from artifacts import ArtifactStore
+from render_cache import RenderCache, cache_key
+import korsord
+import profiling
+import textmetrics
 
 app = Flask(__name__)
+# rendered svgs are shared by all workers through a content-addressed directory
+app.config['ARTIFACT_DIR'] = os.environ.get('KORSORD_ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'korsord-artifacts'))
+# old artifacts are pruned as new ones are stored, so download links expire eventually
+artifacts = ArtifactStore(
+    app.config['ARTIFACT_DIR'],
+    max_entries=int(os.environ.get('KORSORD_ARTIFACT_ENTRIES', 1024)),
+    max_bytes=int(os.environ.get('KORSORD_ARTIFACT_BYTES', 256 * 1024 * 1024)),
+    max_age=int(os.environ.get('KORSORD_ARTIFACT_MAX_AGE', 24 * 60 * 60)),
+)
+# 'fast' skips svgwrite's element objects and validation, the svg is the same
+app.config['RENDER_BACKEND'] = os.environ.get('KORSORD_BACKEND', 'svgwrite')
+# real metrics for the clue font make wrapping match what the browser draws
+font_metrics = (korsord.font_family, os.environ['KORSORD_FONT_FILE']) if os.environ.get('KORSORD_FONT_FILE') else None
+if font_metrics:
+    textmetrics.load_font_metrics(*font_metrics)
+# identical input is only rendered once, optionally persisted across restarts
+render_cache = RenderCache(
+    max_entries=int(os.environ.get('KORSORD_CACHE_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('KORSORD_CACHE_BYTES', 64 * 1024 * 1024)),
+    directory=os.environ.get('KORSORD_CACHE_DIR'),
+    max_disk_bytes=int(os.environ.get('KORSORD_CACHE_DISK_BYTES', 512 * 1024 * 1024)),
+)
+# workers are forked from this process, so they start with the backend already imported
+korsord.load_backend(app.config['RENDER_BACKEND'])
+_render_jobs = None
+_render_jobs_lock = threading.Lock()
+# per-stage render times of every job, see /render_stats
+render_totals = profiling.Totals()
+
+# word list (or index from korsord.py --build-index) for /api/fill, workers map the index and share its pages
+app.config['WORD_LIST'] = os.environ.get('KORSORD_WORD_LIST')
+
+def render_queue():
+    """ the bounded pool of render workers, started by the first request that needs it
+
+    Beyond KORSORD_QUEUE_SIZE waiting or running jobs new ones get a 429.
+    """
+    global _render_jobs
+    with _render_jobs_lock:
+        if _render_jobs is None:
+            import jobs
+            _render_jobs = jobs.JobQueue(
+                workers=int(os.environ.get('KORSORD_WORKERS', os.cpu_count() or 2)),
+                max_pending=int(os.environ.get('KORSORD_QUEUE_SIZE', 16)),
+                timeout=float(os.environ.get('KORSORD_JOB_TIMEOUT', 60)),
+                processes=os.environ.get('KORSORD_WORKER_MODE', 'process') == 'process',
+                initializer=textmetrics.load_font_metrics if font_metrics else None,
+                initargs=font_metrics or (),
+                profile=os.environ.get('KORSORD_PROFILE', '1') != '0',
+            )
+        return _render_jobs
+
+def log_render(kind, seconds, profile):
+    """ one JSON log line per render with its stage times and counters, added to /render_stats """
+    if profile is None:
+        return
+    render_totals.add(profile)
+    app.logger.info(json.dumps({'event': 'render', 'kind': kind, 'seconds': round(seconds, 4), **profile}))
+
+def submit_render(content, compact=False):
+    """ queue a facit and blank render, answered straight from the render cache when possible """
+    both = render_cache.get_both(content, compact=compact)
+    if both is not None:
+        return render_queue().completed_job(both)
+    def done(job):
+        render_cache.put_both(content, job.result, compact=compact)
+        log_render('both', job.finished - job.started, job.profile)
+    return render_queue().submit(
+        korsord.render_both,
+        kwargs={'content': content, 'backend': app.config['RENDER_BACKEND'], 'compact': compact},
+        on_done=done,
+    )
+
+def run_render(fn, kwargs, on_done=None):
+    """ run fn on the worker pool and wait for its result
+
+    Raises jobs.QueueFull when the queue is full, TimeoutError when the job
+    timed out and otherwise the exception the job failed with.
+    """
+    queue = render_queue()
+    job = queue.wait(queue.submit(fn, kwargs=kwargs, on_done=on_done))
+    if job.status != 'done':
+        raise job.error
+    return job.result
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     svg_markup = None
-    svg_file = None
+    svg_id = None
+    blank_id = None
     crossword_data = ""
     highlight_data = ""
     clue_data = ""
     decor_data = ""
 
     if request.method == 'POST':
+        import jobs
         crossword_data = request.form['crossword_data']
         highlight_data = request.form['highlight_data']
         clue_data = request.form['clue_data']
@@ -24,30 +121,36 @@ def index():
         
         if not crossword_data: # if the textarea is empty
             crossword_data = "\n"
-        # Create a temporary input file
-
-        input_file = "temp_crossword.txt"
-        with open(input_file, 'w') as f:
-            f.write(combined_data)
 
-        # Run the crossword script
-        output_file_facit = "temp_crossword_facit.svg"
-        subprocess.run(['python', 'korsord.py', input_file], check=True)
-
-        # Read the generated SVG file
+        # Render the crossword on the worker pool, each result is stored under its own id
+        status = 200
         try:
-            with open(output_file_facit, 'r', encoding='utf-8') as f:
-                svg_content = f.read()
+            job = render_queue().wait(submit_render(combined_data))
+            if job.status != 'done':
+                raise job.error
+            svg_content, blank_content = job.result
             svg_markup = Markup(svg_content)
-        except FileNotFoundError:
+            svg_id = artifacts.put(svg_content)
+            blank_id = artifacts.put(blank_content)
+        except jobs.QueueFull:
+            svg_markup = "The server is busy, please try again in a moment."
+            status = 429
+        except TimeoutError:
+            svg_markup = "SVG generation took too long."
+            status = 504
+        except korsord.InputError as e:
+            # Markup.format escapes the messages, they quote user input
+            svg_markup = Markup("SVG generation failed:<pre>{}</pre>").format(str(e))
+        except (ValueError, IndexError):
             svg_markup = "SVG generation failed."
-
-        # Clean up temporary files
-        os.remove(input_file)
+        except Exception:
+            app.logger.exception("render job failed")
+            svg_markup = "SVG generation failed."
+            status = 500
 
         crossword_data = '\n' + crossword_data
 
-        return render_template('index.html', svg_markup=svg_markup, svg_file=output_file_facit, crossword_data=crossword_data, highlight_data=highlight_data, clue_data=clue_data, decor_data=decor_data)
+        return render_template('index.html', svg_markup=svg_markup, svg_id=svg_id, blank_id=blank_id, crossword_data=crossword_data, highlight_data=highlight_data, clue_data=clue_data, decor_data=decor_data), status
 
     else: #if method is GET
         crossword_data = "\n   S\n   V\n   G\n   \n   C\n   R\n   O\n   S\n   S\n   W\n   O\n   R\n   D\n   \n   G\n   E\n   N\n   E\n   R\n   A\n   T\n   O\n   R\n"
@@ -57,13 +160,255 @@ def index():
 
     return render_template('index.html', crossword_data=crossword_data, highlight_data=highlight_data, clue_data=clue_data, decor_data=decor_data)
 
+@app.context_processor
+def export_formats():
+    import export
+    return {'export_formats': export.available()}
+
+@app.route('/render_patch', methods=['POST'])
+def render_patch():
+    """ live preview: the cell groups that changed since 'previous', or the whole keyed svg """
+    import incremental
+    import jobs
+    data = request.get_json(force=True)
+    if not hasattr(data, 'get') or not isinstance(data.get('content'), str) or not isinstance(data.get('previous') or '', str):
+        return jsonify(error="Expected a JSON object with the input text as content and optionally previous."), 400
+    backend = app.config['RENDER_BACKEND']
+    try:
+        puzzle = korsord.build_puzzle(data['content'])
+        previous = korsord.build_puzzle(data['previous']) if data.get('previous') else None
+    except korsord.InputError as e:
+        return jsonify(error=str(e)), 400
+    except (KeyError, ValueError, IndexError):
+        return jsonify(error="SVG generation failed."), 400
+
+    if previous is not None:
+        _, fragments = incremental.render_changes(previous, incremental.diff_puzzles(previous, puzzle), backend=backend)
+        if fragments is not None:
+            return jsonify(fragments=fragments)
+    # full render is the fallback, e.g. when the grid changed size, and goes through the queue like any render
+    try:
+        svg = run_render(korsord.render_keyed, {'content': data['content'], 'backend': backend})
+    except jobs.QueueFull as e:
+        return jsonify(error=str(e)), 429, {'Retry-After': '1'}
+    except TimeoutError:
+        return jsonify(error="SVG generation took too long."), 504
+    except (ValueError, IndexError):
+        return jsonify(error="SVG generation failed."), 400
+    except Exception:
+        app.logger.exception("render job failed")
+        return jsonify(error="SVG generation failed."), 500
+    return jsonify(svg=svg)
+
+def _request_content(data):
+    # the combined input as 'content', or the four sections by name as text or lists of lines
+    if 'content' in data:
+        if not isinstance(data['content'], str):
+            raise TypeError("content must be a string.")
+        return data['content']
+    sections = [data.get(section, '') for section in korsord.SECTIONS]
+    for name, section in zip(korsord.SECTIONS, sections):
+        if not isinstance(section, str) and not (isinstance(section, list) and all(isinstance(line, str) for line in section)):
+            raise TypeError(f"{name} must be a string or a list of strings.")
+    return korsord.join_sections(*sections)
+
+def _flag(value):
+    # json booleans or query string values like 1/true/yes
+    return value is True or str(value).lower() in ('1', 'true', 'yes')
+
+@app.route('/api/render', methods=['GET', 'POST'])
+def api_render():
+    """ the svg alone, for the four sections as a JSON object (POST) or query parameters (GET)
+
+    The strong ETag is the render cache key, so If-None-Match is answered with
+    304 before anything is parsed or rendered. The finished svg is sent in
+    chunks that are compressed one at a time, not streamed while it renders.
+    """
+    import compress
+    import jobs
+    data = request.get_json(force=True, silent=True) if request.method == 'POST' else request.args
+    if not hasattr(data, 'get'):
+        return jsonify(error="Expected a JSON object with words, clues, highlights and decorations."), 400
+    try:
+        content = _request_content(data)
+    except TypeError as e:
+        return jsonify(error=str(e)), 400
+    options = {'hide_words': _flag(data.get('hide_words')), 'compact': _flag(data.get('compact'))}
+
+    # every content encoding is a different representation with its own tag
+    encoding = compress.choose_encoding(request.accept_encodings)
+    key = cache_key(content, cell_size=40, **options)
+    etag = f'{key}-{encoding}' if encoding else key
+    headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    # a miss is rendered on the worker pool, so it counts against the queue limit
+    svg = render_cache.get(key)
+    if svg is None:
+        def done(job):
+            render_cache.put(key, job.result)
+            log_render('svg', job.finished - job.started, job.profile)
+        try:
+            svg = run_render(korsord.render_svg, {'content': content, 'backend': app.config['RENDER_BACKEND'], **options}, done)
+        except jobs.QueueFull as e:
+            return jsonify(error=str(e)), 429, {'Retry-After': '1'}
+        except TimeoutError:
+            return jsonify(error="SVG generation took too long."), 504
+        except korsord.InputError as e:
+            return jsonify(error=str(e), errors=e.errors), 400
+        except (ValueError, IndexError):
+            return jsonify(error="SVG generation failed."), 400
+        except Exception:
+            app.logger.exception("render job failed")
+            return jsonify(error="SVG generation failed."), 500
+
+    response = Response(compress.encode_chunks(svg, encoding), mimetype='image/svg+xml', headers=headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/fill', methods=['POST'])
+def api_fill():
+    """ fill the empty answer slots of a JSON puzzle (like /api/render) from KORSORD_WORD_LIST
+
+    Answers with the filled words section, whether the fill is complete and
+    the search stats. 'time_budget' in seconds is capped by the job timeout.
+    """
+    if not app.config['WORD_LIST']:
+        return jsonify(error="No word list configured, set KORSORD_WORD_LIST."), 501
+    import fill
+    import jobs
+    data = request.get_json(force=True, silent=True)
+    if not hasattr(data, 'get'):
+        return jsonify(error="Expected a JSON object with words, clues, highlights and decorations."), 400
+    try:
+        time_budget = float(data.get('time_budget', 5))
+    except (TypeError, ValueError):
+        return jsonify(error="time_budget must be a number of seconds."), 400
+    try:
+        content = _request_content(data)
+    except TypeError as e:
+        return jsonify(error=str(e)), 400
+    queue = render_queue()
+    if queue.timeout:
+        # leave the worker time to answer before the job itself times out
+        time_budget = min(time_budget, queue.timeout * 0.9)
+    try:
+        job = queue.submit(fill.fill_text, kwargs={
+            'content': content, 'words': app.config['WORD_LIST'], 'time_budget': time_budget})
+    except jobs.QueueFull as e:
+        return jsonify(error=str(e)), 429, {'Retry-After': '1'}
+    job = queue.wait(job)
+    if job.status == 'done':
+        return jsonify(job.result)
+    if job.status == 'timeout':
+        return jsonify(job.to_dict()), 504
+    if isinstance(job.error, korsord.InputError):
+        return jsonify(error=str(job.error), errors=job.error.errors), 400
+    return jsonify(error="Filling failed."), 400
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """ queue a render of a JSON puzzle (like /api/render) and answer 202 with where to poll """
+    import jobs
+    data = request.get_json(force=True, silent=True)
+    if not hasattr(data, 'get'):
+        return jsonify(error="Expected a JSON object with words, clues, highlights and decorations."), 400
+    try:
+        job = submit_render(_request_content(data), compact=_flag(data.get('compact')))
+    except TypeError as e:
+        return jsonify(error=str(e)), 400
+    except jobs.QueueFull as e:
+        return jsonify(error=str(e)), 429, {'Retry-After': '1'}
+    info = job.to_dict()
+    info['poll'] = url_for('job_status', job_id=job.id)
+    info['result'] = url_for('job_result', job_id=job.id)
+    return jsonify(info), 202, {'Location': info['poll']}
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = render_queue().get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job."), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """ the facit svg of a finished job, ?blank=1 for the blank puzzle """
+    job = render_queue().get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job."), 404
+    if job.status == 'done':
+        facit, blank = job.result
+        return Response(blank if _flag(request.args.get('blank')) else facit, mimetype='image/svg+xml')
+    info = job.to_dict()
+    if job.status == 'timeout':
+        return jsonify(info), 504
+    if job.status == 'failed':
+        if isinstance(job.error, korsord.InputError):
+            info['errors'] = job.error.errors
+        return jsonify(info), 400
+    return jsonify(info), 202, {'Retry-After': '1'}
+
+@app.route('/job_stats')
+def job_stats():
+    return jsonify(render_queue().stats())
+
+@app.route('/render_stats')
+def render_stats():
+    """ total, mean and slowest time per render stage, and the element counters """
+    return jsonify(render_totals.to_dict())
+
 @app.route('/download_svg')
 def download_svg():
-    svg_file = request.args.get('file')
-    if svg_file and os.path.exists(svg_file):
-        return send_file(svg_file, as_attachment=True, download_name='crossword.svg')
+    svg_content = artifacts.get(request.args.get('id'))
+    if svg_content is not None:
+        return send_file(io.BytesIO(svg_content), mimetype='image/svg+xml', as_attachment=True, download_name='crossword.svg')
     else:
         return "SVG file not found.", 404
 
+def _export_response(fn, args, mimetype, download_name):
+    # rasterizing is as heavy as rendering, so it queues on the same workers
+    import jobs
+    queue = render_queue()
+    try:
+        job = queue.wait(queue.submit(fn, args=args))
+    except jobs.QueueFull as e:
+        return str(e), 429, {'Retry-After': '1'}
+    if job.status != 'done':
+        return "Export failed.", 504 if job.status == 'timeout' else 500
+    return send_file(io.BytesIO(job.result), mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+@app.route('/download_pdf')
+def download_pdf():
+    """ the stored svgs named by ?id=...&id=... as the pages of one pdf """
+    import export
+    svgs = [artifacts.get(svg_id) for svg_id in request.args.getlist('id')]
+    if not svgs or None in svgs:
+        return "SVG file not found.", 404
+    if not export.available()['pdf']:
+        return "PDF export is not available on this server.", 501
+    return _export_response(export.pdf_bytes, (svgs, font_metrics[1] if font_metrics else None), 'application/pdf', 'crossword.pdf')
+
+@app.route('/download_png')
+def download_png():
+    """ a stored svg as png, ?dpi= sets the resolution (up to 600) """
+    import export
+    svg_content = artifacts.get(request.args.get('id'))
+    if svg_content is None:
+        return "SVG file not found.", 404
+    if not export.available()['png']:
+        return "PNG export is not available on this server.", 501
+    dpi = min(max(request.args.get('dpi', export.DEFAULT_DPI, type=int), 24), 600)
+    return _export_response(export.to_png, (svg_content, dpi, font_metrics[1] if font_metrics else None), 'image/png', 'crossword.png')
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(render_cache.stats())
+
 if __name__ == '__main__':
     app.run(debug=True, port=5010)
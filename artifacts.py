@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from fsutil import prune_directory, touch, write_atomic
+
+ARTIFACT_ID = re.compile(r'^[0-9a-f]{64}$')
+
+class ArtifactStore:
+    """ content-addressed store for rendered files
+
+    Every artifact is keyed by the sha256 of its bytes, so identical renders
+    share one entry and concurrent writers can never clobber each other.
+    With a directory the store is shared by all workers on the host, without
+    one it lives in the memory of the current process.
+
+    Both are bounded by max_entries and max_bytes, the least recently used
+    artifacts go first. On disk every new artifact also removes the ones not
+    used for max_age seconds (None keeps them). A download link stops
+    working once its artifact is gone.
+    """
+
+    def __init__(self, directory=None, max_entries=1024, max_bytes=256 * 1024 * 1024, max_age=24 * 60 * 60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def put(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        artifact_id = hashlib.sha256(data).hexdigest()
+        if self.directory is None:
+            with self._lock:
+                self._store(artifact_id, data)
+            return artifact_id
+        path = self._path(artifact_id)
+        if os.path.exists(path):
+            touch(path)
+        else:
+            write_atomic(path, data)
+            removed = prune_directory(self.directory, '.svg', self.max_entries, self.max_bytes, self.max_age)
+            with self._lock:
+                self.evictions += removed
+        return artifact_id
+
+    def get(self, artifact_id):
+        """ return the stored bytes, or None for unknown or malformed ids """
+        if not artifact_id or not ARTIFACT_ID.match(artifact_id):
+            return None
+        if self.directory is None:
+            with self._lock:
+                data = self._memory.get(artifact_id)
+                if data is not None:
+                    self._memory.move_to_end(artifact_id)
+                return data
+        path = self._path(artifact_id)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        touch(path)
+        return data
+
+    def _store(self, artifact_id, data):
+        # caller holds the lock
+        if len(data) > self.max_bytes:
+            return
+        old = self._memory.pop(artifact_id, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._memory[artifact_id] = data
+        self._bytes += len(data)
+        while len(self._memory) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _path(self, artifact_id):
+        return os.path.join(self.directory, artifact_id + '.svg')
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Check that the 'fast' string backend writes exactly the same svg as the
+svgwrite reference backend, then compare how long both take.
+
+    python benchmarks/bench_backends.py [--sizes 20 60]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import korsord  # noqa: E402
+from bench_scaling import synthetic_puzzle  # noqa: E402
+
+CONFORMANCE_INPUT = """ÅSA & <B>
+ "Q"  X
+
+A1H1 10 A & B <C>\\n\\n"quoted" clue
+B2V2 12 LONG VERTICAL CLUE TEXT
+C2H2 9 TWO\\nLINES
+
+A2
+B1
+
+A1 AR
+B2 RD
+C2 C
+D1 BRD
+D2 TR
+"""
+
+
+def render(puzzle, backend, **options):
+    return korsord.drawing_to_string(korsord.draw_puzzle(puzzle, backend=backend, **options))
+
+
+def check_conformance():
+    # the conformance input breaks the layout rules on purpose, so skip the layout check
+    conformance = korsord.build_puzzle(CONFORMANCE_INPUT, check=False)
+    cases = [
+        ('conformance input', conformance, {}),
+        ('conformance input, hidden words', conformance, {'hide_words': True}),
+        ('conformance input, compact', conformance, {'compact': True}),
+        ('synthetic 20x30', synthetic_puzzle(20, 30), {}),
+        ('synthetic 20x30, cell size 30', synthetic_puzzle(20, 30), {'cell_size': 30}),
+    ]
+    for name, puzzle, options in cases:
+        reference = render(puzzle, 'svgwrite', **options)
+        fast = render(puzzle, 'fast', **options)
+        if fast != reference:
+            for i, (a, b) in enumerate(zip(reference, fast)):
+                if a != b:
+                    break
+            raise SystemExit(f"{name}: backends differ at offset {i}:\n  svgwrite {reference[i - 40:i + 40]!r}\n  fast     {fast[i - 40:i + 40]!r}")
+        print(f"{name}: identical ({len(reference)} bytes)")
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the svgwrite and fast svg backends.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 60])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    check_conformance()
+    print(f"{'grid':>9} {'svgwrite':>9} {'fast':>9}")
+    for size in args.sizes:
+        rows, cols = size * 2 // 3, size
+        puzzle = synthetic_puzzle(rows, cols)
+        reference = best_time(lambda: render(puzzle, 'svgwrite'), args.repeat)
+        fast = best_time(lambda: render(puzzle, 'fast'), args.repeat)
+        print(f"{rows:>4}x{cols:<4} {reference:>9.4f} {fast:>9.4f}  ({reference / fast:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time the grid filler on a Swedish-style arrow layout against a large word
+list. Without --words a synthetic list is generated: words drawn with Swedish
+letter frequencies (ÅÄÖ included) and a typical length spread, scored by rank.
+
+    python benchmarks/bench_fill.py [--rows 15 --cols 20] [--words ordlista.txt] [--count 300000]
+
+With --attempts N every layout is also filled by fill_parallel: N seeded
+attempts on one worker process and on --jobs processes, first complete fill
+wins. Longer runs (--max-run 8) make the search times uneven enough to show
+the difference. With --index the list is compiled with wordindex.build_index
+and the fills use the memory-mapped index, with the time to open it.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fill  # noqa: E402
+import korsord  # noqa: E402
+import wordindex  # noqa: E402
+
+# approximate letter frequencies of Swedish text, in percent
+SWEDISH_LETTERS = {
+    'A': 9.4, 'B': 1.5, 'C': 1.5, 'D': 4.7, 'E': 10.1, 'F': 2.0, 'G': 2.9, 'H': 2.1, 'I': 5.8,
+    'J': 0.6, 'K': 3.1, 'L': 5.3, 'M': 3.5, 'N': 8.5, 'O': 4.5, 'P': 1.8, 'R': 8.4, 'S': 6.6,
+    'T': 7.7, 'U': 1.9, 'V': 2.4, 'X': 0.2, 'Y': 0.7, 'Z': 0.1, 'Å': 1.3, 'Ä': 1.8, 'Ö': 1.3,
+}
+# share of the word list per word length
+LENGTHS = {2: 1, 3: 4, 4: 8, 5: 11, 6: 13, 7: 14, 8: 13, 9: 11, 10: 9, 11: 7, 12: 5, 13: 4}
+
+
+def synthetic_words(count, seed=1):
+    rng = random.Random(seed)
+    letters, weights = zip(*SWEDISH_LETTERS.items())
+    lengths, length_weights = zip(*LENGTHS.items())
+    words = set()
+    ordered = []
+    while len(ordered) < count:
+        length = rng.choices(lengths, length_weights)[0]
+        word = ''.join(rng.choices(letters, weights, k=length))
+        if word not in words:
+            words.add(word)
+            ordered.append(word)
+    # earlier words score higher, like a frequency list
+    return ordered, [count - rank for rank in range(count)]
+
+
+def synthetic_layout(rows, cols, seed=1, max_run=6):
+    """ a Puzzle with clue boxes along the top and left edge and scattered inside, arrows into every run """
+    rng = random.Random(seed)
+    clue = [[r == 0 or c == 0 for c in range(cols)] for r in range(rows)]
+    for r in range(2, rows):
+        for c in range(2, cols):
+            # no clue cells next to each other inside the grid, they'd leave one-letter runs
+            if rng.random() < 0.14 and not (clue[r - 1][c] or clue[r][c - 1] or clue[r - 1][c - 1]):
+                clue[r][c] = True
+    # break runs that are longer than max_run
+    for r in range(rows):
+        run = 0
+        for c in range(cols):
+            run = 0 if clue[r][c] else run + 1
+            if run > max_run and c + 1 < cols:
+                clue[r][c] = True
+                run = 0
+    for c in range(cols):
+        run = 0
+        for r in range(rows):
+            run = 0 if clue[r][c] else run + 1
+            if run > max_run and r + 1 < rows:
+                clue[r][c] = True
+                run = 0
+    puzzle = korsord.Puzzle(rows, cols)
+    for r in range(rows):
+        for c in range(cols):
+            if not clue[r][c]:
+                continue
+            puzzle.add_clue_box(r, c, r, c, 'CLUE', 8)
+            position = f'{chr(ord("A") + c)}{r + 1}'
+            if c + 2 < cols and not clue[r][c + 1] and not clue[r][c + 2]:
+                puzzle.decorations.append((position, 'AR'))
+            if r + 2 < rows and not clue[r + 1][c] and not clue[r + 2][c]:
+                puzzle.decorations.append((position, 'AD'))
+    return puzzle
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the grid filler.')
+    parser.add_argument('--rows', type=int, default=15)
+    parser.add_argument('--cols', type=int, default=20)
+    parser.add_argument('--words', help='Word list, one word per line with an optional score.')
+    parser.add_argument('--count', type=int, default=300000, help='Size of the synthetic word list.')
+    parser.add_argument('--layouts', type=int, default=5, help='Number of different layouts to fill.')
+    parser.add_argument('--budget', type=float, default=10.0, help='Time budget per fill in seconds.')
+    parser.add_argument('--max-run', type=int, default=6, help='Longest run of open cells in the layouts.')
+    parser.add_argument('--attempts', type=int, default=0, help='Also compare N parallel attempts on 1 and --jobs processes.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--index', action='store_true', help='Fill from a prebuilt memory-mapped index of the list.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.words:
+        store = fill.WordStore.from_file(args.words)
+    else:
+        store = fill.WordStore(*synthetic_words(args.count))
+    print(f"word store: {len(store)} words indexed in {time.perf_counter() - start:.2f}s")
+    directory = tempfile.TemporaryDirectory() if args.index else None
+    if args.index:
+        source = args.words or os.path.join(directory.name, 'words.txt')
+        if not args.words:
+            with open(source, 'w', encoding='utf-8') as file:
+                file.writelines(f'{store.word(length, i)} {store.score(length, i)}\n'
+                                for length in sorted(store.words) for i in range(store.count(length)))
+        start = time.perf_counter()
+        target, _ = wordindex.build_index(source, os.path.join(directory.name, 'words.idx'))
+        print(f"word index: built in {time.perf_counter() - start:.2f}s, {os.path.getsize(target) / 1e6:.1f} MB")
+        start = time.perf_counter()
+        store = wordindex.WordIndex(target)
+        print(f"word index: opened in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    print(f"{'layout':>6} {'slots':>6} {'filled':>7} {'nodes':>8} {'backtracks':>10} {'seconds':>8}  result")
+    layouts = [synthetic_layout(args.rows, args.cols, seed, args.max_run) for seed in range(1, args.layouts + 1)]
+    for seed, puzzle in enumerate(layouts, 1):
+        result = fill.fill(puzzle, store, time_budget=args.budget)
+        stats = result.stats
+        print(f"{seed:>6} {stats['slots']:>6} {stats['filled']:>7} {stats['nodes']:>8} {stats['backtracks']:>10} {stats['seconds']:>8.3f}  {outcome(result)}")
+
+    if args.attempts:
+        print(f"\n{args.attempts} attempts, first complete fill wins (wall seconds include starting the workers)")
+        print(f"{'layout':>6} {'1 process':>20} {f'{args.jobs} processes':>20}")
+        for seed, puzzle in enumerate(layouts, 1):
+            cells = []
+            for workers in (1, args.jobs):
+                result = fill.fill_parallel(puzzle, store, attempts=args.attempts, workers=workers, time_budget=args.budget)
+                cells.append(f"{result.stats['seconds']:.3f} {outcome(result)}")
+            print(f"{seed:>6} {cells[0]:>20} {cells[1]:>20}")
+
+    if directory is not None:
+        store.close()
+        directory.cleanup()
+
+
+def outcome(result):
+    if result.complete:
+        return 'complete'
+    return 'timed out' if result.stats['timed_out'] else 'no fill'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare renders/second of the example puzzle three ways:
+
+- subprocess: a new korsord.py process per render, the way app.index used
+  to call it. This is today's CLI, so it includes the layout check and
+  writes the facit and the blank svg.
+- app: POST / with the render cache emptied before every request, so each
+  one renders facit and blank on the app's worker queue.
+- in-process: korsord.render_both called directly, without the app.
+
+    python benchmarks/bench_inprocess.py [-n 50]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import korsord  # noqa: E402
+from app import app, render_cache  # noqa: E402
+
+
+def example_input():
+    # same puzzle as the one preloaded on the GET page
+    client = app.test_client()
+    page = client.get('/').get_data(as_text=True)
+    sections = []
+    for name in ('crossword_data', 'clue_data', 'highlight_data', 'decor_data'):
+        start = page.index('name="%s"' % name)
+        start = page.index('>', start) + 1
+        end = page.index('</textarea>', start)
+        sections.append(page[start:end].strip('\n'))
+    return sections
+
+
+def post_form(sections):
+    grid, clues, highlights, decorations = sections
+    return {
+        'crossword_data': grid,
+        'clue_data': clues,
+        'highlight_data': highlights,
+        'decor_data': decorations,
+        'combined_data': '\n\n'.join(sections),
+    }
+
+
+def render_subprocess(combined_data, workdir):
+    # what app.index used to do for every POST
+    input_file = os.path.join(workdir, 'temp_crossword.txt')
+    with open(input_file, 'w', encoding='utf-8') as f:
+        f.write(combined_data)
+    subprocess.run([sys.executable, os.path.join(ROOT, 'korsord.py'), input_file], check=True)
+    with open(os.path.join(workdir, 'temp_crossword_facit.svg'), 'r', encoding='utf-8') as f:
+        svg_content = f.read()
+    os.remove(input_file)
+    return svg_content
+
+
+def requests_per_second(func, n):
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rendering in a subprocess, through the app and in process.')
+    parser.add_argument('-n', type=int, default=50, help='Number of renders per variant.')
+    args = parser.parse_args()
+
+    form = post_form(example_input())
+    client = app.test_client()
+
+    def post():
+        # a cache hit would skip the render this is meant to time
+        render_cache.clear()
+        response = client.post('/', data=form)
+        if response.status_code != 200:
+            raise RuntimeError(f"POST / answered {response.status_code}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        before = requests_per_second(lambda: render_subprocess(form['combined_data'], workdir), args.n)
+    in_app = requests_per_second(post, args.n)
+    direct = requests_per_second(lambda: korsord.render_both(form['combined_data']), args.n)
+
+    print(f"{'subprocess render':<20} {before:8.1f} renders/s")
+    print(f"{'app, cache emptied':<20} {in_app:8.1f} renders/s  ({in_app / before:.1f}x)")
+    print(f"{'in-process render':<20} {direct:8.1f} renders/s  ({direct / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time draw_puzzle on synthetic grids of growing size. Roughly every
+fourth cell is a clue box, so the number of clues grows with the number of
+cells; a linear renderer keeps the time per cell flat.
+
+    python benchmarks/bench_scaling.py [--sizes 10 20 40 60]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import korsord  # noqa: E402
+
+
+def synthetic_puzzle(rows, cols):
+    # letters everywhere except a clue box on every other cell of every other row,
+    # alternating one-cell and two-cell (vertical) boxes
+    puzzle = korsord.Puzzle(rows, cols)
+    for r in range(rows):
+        puzzle.set_row(r, [chr(ord('A') + (r + c) % 26) for c in range(cols)])
+    for r in range(0, rows, 2):
+        for c in range(0, cols, 2):
+            puzzle.set_letter(r, c, '')
+            if (r // 2 + c // 2) % 2 and r + 1 < rows:
+                puzzle.set_letter(r + 1, c, '')
+                puzzle.add_clue_box(r, c, r + 1, c, 'LONGER CLUE', 9)
+            else:
+                puzzle.add_clue_box(r, c, r, c, 'CLUE', 10)
+            # positions are single letter columns, so only the first 26 get arrows
+            if c < 26:
+                puzzle.decorations.append((f'{chr(ord("A") + c)}{r + 1}', 'AR' if r % 4 else 'RD'))
+    for position in ['B2', 'C3', 'D4']:
+        puzzle.highlight(*korsord.alpha_to_index(position))
+    return puzzle
+
+
+def time_render(puzzle, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        korsord.draw_puzzle(puzzle)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark draw_puzzle scaling with grid size.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 20, 40, 60])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'grid':>9} {'cells':>7} {'clues':>6} {'seconds':>9} {'us/cell':>8}")
+    for size in args.sizes:
+        rows, cols = size * 2 // 3, size
+        puzzle = synthetic_puzzle(rows, cols)
+        seconds = time_render(puzzle, args.repeat)
+        cells = rows * cols
+        print(f"{rows:>4}x{cols:<4} {cells:>7} {len(puzzle.clue_boxes):>6} {seconds:>9.4f} {seconds / cells * 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
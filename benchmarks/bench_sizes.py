@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report svg sizes with and without compact (<symbol>/<use>) decorations for
+the default example and for synthetic grids full of arrows.
+
+    python benchmarks/bench_sizes.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import korsord  # noqa: E402
+from bench_inprocess import example_input  # noqa: E402
+from bench_scaling import synthetic_puzzle  # noqa: E402
+
+
+def svg_size(puzzle, **options):
+    dwg = korsord.draw_puzzle(puzzle, backend='fast', **options)
+    return len(korsord.drawing_to_string(dwg).encode('utf-8'))
+
+
+def main():
+    cases = [('default example', korsord.build_puzzle('\n\n'.join(example_input())))]
+    for size in (20, 40):
+        cases.append((f'synthetic {size * 2 // 3}x{size}', synthetic_puzzle(size * 2 // 3, size)))
+
+    print(f"{'puzzle':<18} {'decorations':>11} {'plain':>9} {'compact':>9}")
+    for name, puzzle in cases:
+        plain = svg_size(puzzle)
+        compact = svg_size(puzzle, compact=True)
+        print(f"{name:<18} {len(puzzle.decorations):>11} {plain:>9} {compact:>9}  ({(compact - plain) / plain:+.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup costs: what importing korsord (and optionally app) spends its time
+on, how long a cold korsord.py run takes, and what one warm --serve process
+saves over a new interpreter per puzzle.
+
+    python benchmarks/bench_startup.py [-n 20] [--app] [--max-import-ms 60]
+
+With --max-import-ms the script exits 1 when importing korsord, or the app
+on top of the packages it cannot start without (Flask and the svg backend
+it loads for its workers), takes longer. A check run catches a module that
+went back to importing something heavy at the top.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_suite import synthetic_input  # noqa: E402
+
+KORSORD = os.path.join(ROOT, 'korsord.py')
+# imported before the app is timed, what is left is the app's own startup
+APP_PRELOAD = ('flask', 'markupsafe', 'svgwrite.extensions')
+
+
+def import_times(module, preload=()):
+    """ (total us, [(self us, cumulative us, name)]) of importing module in a fresh interpreter
+
+    The preload modules are imported first and not counted.
+    """
+    code = ''.join(f'import {name}; ' for name in preload) + f'import {module}'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(own), int(cumulative), name.strip()))
+    if preload:
+        # the rows of the preloaded modules come first and end with the last of them
+        last = max(i for i, (_, _, name) in enumerate(rows) if name == preload[-1])
+        rows = rows[last + 1:]
+    total = next(cumulative for _, cumulative, name in reversed(rows) if name == module)
+    return total, rows
+
+
+def best_of(repeat, command):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def serve_seconds(input_files, *options):
+    """ wall time of one --serve process rendering input_files, start to last answer """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, KORSORD, '--serve', *options],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    for input_file in input_files:
+        process.stdin.write(input_file + '\n')
+        process.stdin.flush()
+        process.stdout.readline()
+    process.stdin.close()
+    process.wait()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import and startup time of korsord.')
+    parser.add_argument('-n', type=int, default=20, help='Puzzles rendered cold and through --serve.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per cold start measurement, the fastest counts.')
+    parser.add_argument('--top', type=int, default=8, help='Slowest modules to list.')
+    parser.add_argument('--app', action='store_true', help='Also report the import time of the Flask app.')
+    parser.add_argument('--max-import-ms', type=float,
+                        help='Exit 1 when importing korsord or the app (without Flask) takes longer than this.')
+    args = parser.parse_args()
+
+    imports = [('korsord', 'korsord', ())]
+    if args.app:
+        imports.append(('app', 'app', ()))
+    if args.app or args.max_import_ms is not None:
+        imports.append(('app without Flask', 'app', APP_PRELOAD))
+    checked = {}
+    for label, module, preload in imports:
+        total, rows = import_times(module, preload)
+        if label != 'app':
+            checked[label] = total
+        print(f"import {label}: {total / 1000:.1f} ms, slowest modules (self / cumulative ms):")
+        for own, cumulative, name in sorted(rows, reverse=True)[:args.top]:
+            print(f"  {own / 1000:7.1f} {cumulative / 1000:7.1f}  {name}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        input_files = []
+        for i in range(args.n):
+            input_file = os.path.join(workdir, f'puzzle{i}.txt')
+            with open(input_file, 'w', encoding='utf-8') as file:
+                file.write(synthetic_input(15, 15, seed=i))
+            input_files.append(input_file)
+
+        print(f"\n{'cold start':<28} {'ms':>8}")
+        print(f"{'python -c pass':<28} {best_of(args.repeat, [sys.executable, '-c', 'pass']) * 1000:>8.1f}")
+        for label, options in (('render (svgwrite)', []), ('render (--backend fast)', ['--backend', 'fast']),
+                               ('--check', ['--check'])):
+            seconds = best_of(args.repeat, [sys.executable, KORSORD, input_files[0], *options])
+            print(f"{label:<28} {seconds * 1000:>8.1f}")
+
+        cold = best_of(1, [sys.executable, '-c', f'''
+import subprocess, sys
+for input_file in {input_files!r}:
+    subprocess.run([sys.executable, {KORSORD!r}, input_file], check=True)
+'''])
+        warm = serve_seconds(input_files)
+        print(f"\n{args.n} puzzles, one process each: {cold:6.2f}s ({cold / args.n * 1000:.1f} ms per puzzle)")
+        print(f"{args.n} puzzles through --serve:    {warm:6.2f}s ({warm / args.n * 1000:.1f} ms per puzzle, {cold / warm:.1f}x)")
+
+    slow = [label for label, total in checked.items() if args.max_import_ms is not None and total / 1000 > args.max_import_ms]
+    for label in slow:
+        print(f"\nimporting {label} took {checked[label] / 1000:.1f} ms, more than {args.max_import_ms} ms", file=sys.stderr)
+    return 1 if slow else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
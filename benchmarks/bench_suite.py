@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the whole pipeline on synthetic puzzles and write the results as
+JSON, so two versions can be compared.
+
+Every case is a generated four-section input (words, clues, highlights,
+decorations) of rows x cols cells at a clue and decoration density. It is
+timed per stage in process (profiling.py: parse, build, check, cells, clues,
+decorations, serialize), end to end through the CLI (korsord.py in a new
+process) and through the app (/api/render with an empty render cache). The
+peak Python heap of an in-process render (tracemalloc) and the peak RSS of
+the CLI process are recorded too. Positions can only name the columns A-Z,
+so clues and decorations are placed in the first 26 columns of wider grids.
+
+    python benchmarks/bench_suite.py [--sizes 10 25 50 100] [--densities sparse dense] -o results.json
+    python benchmarks/bench_suite.py -o new.json --compare old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import korsord  # noqa: E402
+import profiling  # noqa: E402
+from validate import MAX_COLUMNS  # noqa: E402
+
+# share of the addressable cells that start a clue box / carry a decoration
+DENSITIES = {
+    'sparse': (0.08, 0.05),
+    'typical': (0.2, 0.2),
+    'dense': (0.35, 0.5),
+}
+CLUE_WORDS = ['HUVUDSTAD', 'FÅGEL', 'NOT', 'ÄR I SKOGEN', 'KAN VARA LÅNG', 'ÖVER', 'TRÄD', 'SJÖ I NORR']
+
+
+def synthetic_input(rows, cols, clue_density=0.2, decoration_density=0.2, seed=1):
+    """ the combined input text of a random puzzle, without layout errors """
+    rng = random.Random(seed)
+    letters = [[chr(ord('A') + rng.randrange(26)) for _ in range(cols)] for _ in range(rows)]
+    taken = [[False] * cols for _ in range(rows)]
+    addressable = [(row, col) for row in range(rows) for col in range(min(cols, MAX_COLUMNS))]
+
+    clues = []
+    for row, col in rng.sample(addressable, int(len(addressable) * clue_density)):
+        if taken[row][col]:
+            continue
+        # every third box spans two cells down, when there is room
+        span = 2 if rng.random() < 0.33 and row + 1 < rows and not taken[row + 1][col] else 1
+        for r in range(row, row + span):
+            taken[r][col] = True
+            letters[r][col] = ' '
+        text = ' '.join(rng.sample(CLUE_WORDS, span))
+        clues.append(f'{chr(ord("A") + col)}{row + 1}V{span} {9 if span > 1 else 10} {text}')
+
+    codes = [code for code in korsord.DECORATIONS if code != 'C']
+    decorations = [f'{chr(ord("A") + col)}{row + 1} {rng.choice(codes)}'
+                   for row, col in rng.sample(addressable, int(len(addressable) * decoration_density))]
+    highlights = [f'{chr(ord("A") + col)}{row + 1}' for row, col in rng.sample(addressable, min(5, len(addressable)))]
+
+    words = '\n'.join(''.join(row) for row in letters)
+    return korsord.join_sections(words, '\n'.join(clues), '\n'.join(highlights), '\n'.join(decorations))
+
+
+def time_stages(content, repeat):
+    # the fastest of repeat renders, with the stage times of that run
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with profiling.profile() as active:
+            korsord.render_both(content)
+        total = time.perf_counter() - start
+        if best is None or total < best[0]:
+            best = (total, active.to_dict())
+    return best
+
+
+def peak_memory(content):
+    tracemalloc.start()
+    try:
+        korsord.render_both(content)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def time_cli(content, repeat, workdir):
+    """ best wall time and peak RSS in kB of korsord.py rendering content, None where unavailable """
+    input_file = os.path.join(workdir, 'bench.txt')
+    with open(input_file, 'w', encoding='utf-8') as file:
+        file.write(content)
+    best = rss = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'korsord.py'), input_file])
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            rss = max(rss or 0, usage.ru_maxrss)
+        else:
+            process.wait()
+        elapsed = time.perf_counter() - start
+        if process.returncode:
+            raise RuntimeError(f"korsord.py failed on {input_file}")
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rss
+
+
+def time_flask(client, render_cache, content, repeat):
+    best = None
+    for _ in range(repeat):
+        render_cache.clear()
+        start = time.perf_counter()
+        response = client.post('/api/render', json={'content': content})
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/render answered {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def compare(results, baseline):
+    # cases are matched by name, slower is a ratio above 1
+    old = {case['name']: case for case in baseline['cases']}
+    print(f"\nagainst {baseline.get('revision') or 'baseline'} ({baseline.get('started')}):")
+    print(f"{'case':<18} {'render':>8} {'cli':>8} {'flask':>8} {'memory':>8}")
+    for case in results['cases']:
+        before = old.get(case['name'])
+        if before is None:
+            continue
+        ratios = []
+        for key in ('total_ms', 'cli_ms', 'flask_ms', 'peak_kb'):
+            ratios.append(f"{case[key] / before[key]:>7.2f}x" if case.get(key) and before.get(key) else f"{'-':>8}")
+        print(f"{case['name']:<18} {' '.join(ratios)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every render stage, the CLI and the app on synthetic puzzles.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 25, 50, 100], help='Square grid sizes.')
+    parser.add_argument('--densities', nargs='+', choices=sorted(DENSITIES), default=['sparse', 'dense'])
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the fastest counts.')
+    parser.add_argument('--no-cli', action='store_true', help='Skip the end-to-end CLI timing.')
+    parser.add_argument('--no-flask', action='store_true', help='Skip the /api/render timing.')
+    parser.add_argument('-o', '--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--compare', metavar='JSON', help='Print the ratios to an earlier --output.')
+    args = parser.parse_args()
+
+    client = render_cache = None
+    if not args.no_flask:
+        from app import app, render_cache
+        client = app.test_client()
+
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'revision': revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'cases': [],
+    }
+    print(f"{'case':<18} {'clues':>6} {'decor':>6} {'kB':>6} {'render ms':>10} {'heap kB':>8} {'cli ms':>8} {'rss kB':>8} {'flask ms':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            for density in args.densities:
+                clue_density, decoration_density = DENSITIES[density]
+                content = synthetic_input(size, size, clue_density, decoration_density)
+                puzzle = korsord.build_puzzle(content)
+                total, profile = time_stages(content, args.repeat)
+                cli, rss = time_cli(content, args.repeat, workdir) if not args.no_cli else (None, None)
+                case = {
+                    'name': f'{size}x{size} {density}',
+                    'rows': size,
+                    'cols': size,
+                    'clues': len(puzzle.clue_boxes),
+                    'decorations': len(puzzle.decorations),
+                    'bytes': profile['counters'].get('bytes'),
+                    'total_ms': ms(total),
+                    'stages_ms': profile['stages_ms'],
+                    'counters': profile['counters'],
+                    'peak_kb': round(peak_memory(content) / 1024),
+                    'cli_ms': ms(cli),
+                    'cli_maxrss_kb': rss,
+                    'flask_ms': ms(time_flask(client, render_cache, content, args.repeat)) if client else None,
+                }
+                results['cases'].append(case)
+                print(f"{case['name']:<18} {case['clues']:>6} {case['decorations']:>6} {case['bytes'] // 1024:>6} "
+                      f"{case['total_ms']:>10.1f} {case['peak_kb']:>8} {case['cli_ms'] or 0:>8.1f} "
+                      f"{case['cli_maxrss_kb'] or 0:>8} {case['flask_ms'] or 0:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
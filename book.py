@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Puzzle books: many puzzles and their solutions laid out on the pages of one
+document.
+
+Each puzzle is drawn once with the fast backend and compact decorations
+(korsord.draw_puzzle), then its elements are placed in a slot of a page
+grid. The font @import and the decoration <symbol>s are written once for
+the whole book instead of once per puzzle. Pages are written as soon as
+they are full. The solution pages come after all blank pages, and are
+spooled to a temporary file until then, so memory stays flat however long
+the book is.
+
+write_book() writes one SVG with the pages below each other. pages() gives
+every page as a standalone SVG, e.g. for export.write_pdf.
+"""
+
+import json
+import math
+import tempfile
+from collections import namedtuple
+
+import korsord
+import svgfast
+
+# space around and between the puzzles, in svg pixels
+MARGIN = 20
+
+class BookError(ValueError):
+    """ the input errors of every bad puzzle of a book, as (input file, korsord.InputError) """
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__('\n'.join(f"{input_file}: {error}" for input_file, error in failures))
+
+    def __reduce__(self):
+        return BookError, (self.failures,)
+
+class Layout(namedtuple('Layout', 'columns rows slot_width slot_height margin')):
+    """ a grid of equal slots per page, big enough for the largest puzzle """
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+    @property
+    def page_width(self):
+        return self.columns * (self.slot_width + self.margin) + self.margin
+
+    @property
+    def page_height(self):
+        return self.rows * (self.slot_height + self.margin) + self.margin
+
+    def slot(self, index):
+        """ the page and the top left corner on it of the index-th puzzle """
+        page, slot = divmod(index, self.per_page)
+        row, col = divmod(slot, self.columns)
+        return page, self.margin + col * (self.slot_width + self.margin), self.margin + row * (self.slot_height + self.margin)
+
+def plan(input_files, columns=2, rows=None, cell_size=40, margin=MARGIN):
+    """ the Layout for a book of input_files; rows=None puts every puzzle on one sheet
+
+    The files are parsed and checked, but not drawn, so a bad puzzle stops
+    the book before anything is written. All bad puzzles are reported
+    together in a BookError.
+    """
+    if not input_files:
+        raise ValueError("A book needs at least one puzzle.")
+    width = height = 0
+    failures = []
+    for input_file in input_files:
+        try:
+            with open(input_file, 'r', encoding='utf-8') as file:
+                puzzle = korsord.build_puzzle(file.read())
+        except korsord.InputError as e:
+            failures.append((input_file, e))
+            continue
+        width = max(width, puzzle.cols * cell_size)
+        height = max(height, puzzle.rows * cell_size)
+    if failures:
+        raise BookError(failures)
+    columns = min(columns, len(input_files))
+    if rows is None:
+        rows = math.ceil(len(input_files) / columns)
+    return Layout(columns, rows, width, height, margin)
+
+def _draw(input_file, cell_size):
+    # the facit and blank bodies of a puzzle and its defs: the font style, then the symbols by id
+    with open(input_file, 'r', encoding='utf-8') as file:
+        puzzle = korsord.build_puzzle(file.read())
+    # every symbol is shared by the whole book, so even a code used once in this puzzle gets one
+    dwg = korsord.draw_puzzle(puzzle, cell_size=cell_size, backend='fast', compact=True, min_uses=1)
+    style, *symbols = dwg.defs.elements
+    facit = ''.join(dwg.tostrings(dwg.elements))
+    dwg.words_layer.elements.clear()
+    blank = ''.join(dwg.tostrings(dwg.elements))
+    return facit, blank, style, {symbol.attribs['id']: symbol.tostring() for symbol in symbols}
+
+def _pages(input_files, layout, solutions, cell_size, defs):
+    """ (symbol ids, body) of every page, blank pages first; defs collects the style and symbols """
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+        page = None
+        used = set()
+        parts, solution_parts = [], []
+        for index, input_file in enumerate(input_files):
+            facit, blank, style, symbols = _draw(input_file, cell_size)
+            defs.setdefault('style', style)
+            defs.update(symbols)
+            number, x, y = layout.slot(index)
+            if number != page:
+                if parts:
+                    yield sorted(used), ''.join(parts)
+                    if solutions:
+                        spool.write(json.dumps([sorted(used), ''.join(solution_parts)]) + '\n')
+                page, used, parts, solution_parts = number, set(), [], []
+            used.update(symbols)
+            parts.append(f'<g transform="translate({x},{y})">{blank}</g>')
+            solution_parts.append(f'<g transform="translate({x},{y})">{facit}</g>')
+        yield sorted(used), ''.join(parts)
+        if solutions:
+            spool.write(json.dumps([sorted(used), ''.join(solution_parts)]) + '\n')
+            spool.seek(0)
+            for line in spool:
+                yield json.loads(line)
+
+def _svg_start(width, height):
+    attribs = {'baseProfile': 'full', 'version': '1.1', 'width': width, 'height': height}
+    attribs.update(svgfast.SVG_NAMESPACES)
+    attribs.update(svgfast.INKSCAPE_NAMESPACES)
+    return '%s<svg%s>' % (svgfast.XML_HEADER, svgfast.attribute_string(attribs))
+
+def write_book(input_files, output, columns=2, rows=None, solutions=True, cell_size=40, margin=MARGIN):
+    """ write input_files as the pages of one svg to output (a path or text file), return the page count
+
+    rows is the number of puzzle rows per page, None for a single sheet
+    with every puzzle (and a second one with the solutions).
+    """
+    layout = plan(input_files, columns, rows, cell_size, margin)
+    if not hasattr(output, 'write'):
+        with open(output, 'w', encoding='utf-8') as file:
+            return _write_book(input_files, file, layout, solutions, cell_size)
+    return _write_book(input_files, output, layout, solutions, cell_size)
+
+def _write_book(input_files, output, layout, solutions, cell_size):
+    count = math.ceil(len(input_files) / layout.per_page) * (2 if solutions else 1)
+    defs = {}
+    written = set()
+    output.write(_svg_start(layout.page_width, layout.page_height * count))
+    for number, (ids, body) in enumerate(_pages(input_files, layout, solutions, cell_size, defs)):
+        new = [defs[key] for key in ['style'] + ids if key not in written]
+        if new:
+            output.write('<defs>%s</defs>' % ''.join(new))
+            written.update(['style'] + ids)
+        output.write(f'<g id="page-{number + 1}" transform="translate(0,{number * layout.page_height})">{body}</g>')
+    output.write('</svg>')
+    return count
+
+def pages(input_files, columns=2, rows=None, solutions=True, cell_size=40, margin=MARGIN):
+    """ every page of the book as a standalone svg string, generated one at a time
+
+    The puzzles are checked before this returns, the pages are drawn as they
+    are taken.
+    """
+    layout = plan(input_files, columns, rows, cell_size, margin)
+    return _standalone_pages(input_files, layout, solutions, cell_size)
+
+def _standalone_pages(input_files, layout, solutions, cell_size):
+    defs = {}
+    for ids, body in _pages(input_files, layout, solutions, cell_size, defs):
+        head = _svg_start(layout.page_width, layout.page_height)
+        yield '%s<defs>%s</defs>%s</svg>' % (head, ''.join(defs[key] for key in ['style'] + ids), body)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Content-Encoding for chunked responses: gzip from the standard library, and
+brotli when the optional brotli package is installed (pip install brotli).
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_SIZE = 16 * 1024
+
+def available_encodings():
+    # in order of preference
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def choose_encoding(accept_encodings):
+    """ the best encoding in a werkzeug Accept-Encoding header, None for identity """
+    best, best_quality = None, 0
+    for name in available_encodings():
+        quality = accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+def encode_chunks(text, encoding=None, chunk_size=CHUNK_SIZE):
+    """ yield text as utf-8 in chunks, each encoded and compressed only when it is sent """
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+    elif encoding == 'br' and brotli is not None:
+        compressor = brotli.Compressor()
+        process, finish = compressor.process, compressor.finish
+    elif encoding is None:
+        process = finish = None
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+    for start in range(0, len(text), chunk_size):
+        chunk = text[start:start + chunk_size].encode('utf-8')
+        if process is not None:
+            chunk = process(chunk)
+        if chunk:
+            yield chunk
+    if finish is not None:
+        yield finish()
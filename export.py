@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Print export: PDF and PNG from the rendered SVG.
+
+The SVG loads its font with a Google Fonts @import, which a print RIP or an
+offline machine can't follow. Before rasterizing, that import is dropped
+and, given a local TrueType/OpenType file, every <text> is replaced by the
+font's glyph outlines (fontTools), so the output looks the same everywhere
+without embedding a font. Parsed fonts and glyph paths are kept per process
+and reused for every page.
+
+Rasterizing needs cairosvg (pip install cairosvg) and joining pages into
+one PDF needs pypdf (pip install pypdf); both are optional, available()
+tells what can be produced.
+"""
+
+import io
+import itertools
+import threading
+import xml.etree.ElementTree as ET
+
+try:
+    import cairosvg
+except (ImportError, OSError): # OSError when the cairo library itself is missing
+    cairosvg = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+# svg pixels are CSS pixels, 96 to the inch
+CSS_DPI = 96
+DEFAULT_DPI = 300
+
+SVG = 'http://www.w3.org/2000/svg'
+XLINK = 'http://www.w3.org/1999/xlink'
+NAMESPACES = {
+    '': SVG,
+    'xlink': XLINK,
+    'ev': 'http://www.w3.org/2001/xml-events',
+    'inkscape': 'http://www.inkscape.org/namespaces/inkscape',
+    'sodipodi': 'http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd',
+}
+for prefix, uri in NAMESPACES.items():
+    ET.register_namespace(prefix, uri)
+
+def available():
+    """ the export formats that can be produced with the installed packages """
+    return {'png': cairosvg is not None, 'pdf': cairosvg is not None and pypdf is not None}
+
+def _require_cairosvg():
+    if cairosvg is None:
+        raise RuntimeError("PDF and PNG export needs cairosvg (pip install cairosvg).")
+
+class FontOutlines:
+    """ glyph outlines and advance widths of one font file, paths computed once per glyph """
+
+    def __init__(self, path):
+        try:
+            from fontTools.ttLib import TTFont
+        except ImportError:
+            raise RuntimeError("Outlining text needs fontTools (pip install fonttools).")
+        self.font = TTFont(path)
+        self.cmap = self.font.getBestCmap()
+        self.glyph_set = self.font.getGlyphSet()
+        self.advances = self.font['hmtx'].metrics
+        self.units_per_em = self.font['head'].unitsPerEm
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def glyph(self, char):
+        """ the glyph name for char, '.notdef' when the font doesn't have it """
+        return self.cmap.get(ord(char), '.notdef')
+
+    def advance(self, glyph):
+        return self.advances[glyph][0] if glyph in self.advances else self.units_per_em // 2
+
+    def path(self, glyph):
+        """ svg path data of glyph in font units, y up """
+        path = self._paths.get(glyph)
+        if path is None:
+            from fontTools.pens.svgPathPen import SVGPathPen
+            with self._lock:
+                pen = SVGPathPen(self.glyph_set)
+                self.glyph_set[glyph].draw(pen)
+                path = self._paths[glyph] = pen.getCommands()
+        return path
+
+_fonts = {}
+_fonts_lock = threading.Lock()
+
+def font_outlines(path):
+    """ the FontOutlines of a font file, parsed once per process """
+    with _fonts_lock:
+        outlines = _fonts.get(path)
+        if outlines is None:
+            outlines = _fonts[path] = FontOutlines(path)
+    return outlines
+
+def _number(value):
+    # short, exact enough for print
+    return f'{value:.3f}'.rstrip('0').rstrip('.')
+
+def prepare_svg(svg, font_file=None):
+    """ the svg ready for a rasterizer: no remote font import, text as outlines when font_file is given """
+    root = ET.fromstring(svg.encode('utf-8') if isinstance(svg, str) else svg)
+    defs = root.find(f'{{{SVG}}}defs')
+    if defs is None:
+        defs = ET.Element(f'{{{SVG}}}defs')
+        root.insert(0, defs)
+    for style in defs.findall(f'{{{SVG}}}style'):
+        if '@import' in (style.text or ''):
+            defs.remove(style)
+
+    if font_file:
+        font = font_outlines(font_file)
+        used = set()
+        for parent in root.iter():
+            for i, child in enumerate(list(parent)):
+                if child.tag == f'{{{SVG}}}text':
+                    parent[i] = _outline_text(child, font, used)
+        for glyph in sorted(used):
+            ET.SubElement(defs, f'{{{SVG}}}path', id=_glyph_id(font, glyph), d=font.path(glyph))
+    return ET.tostring(root, encoding='utf-8')
+
+def _glyph_id(font, glyph):
+    return f'glyph-{font.font.getGlyphID(glyph)}'
+
+def _outline_text(text, font, used):
+    # one <use> of the shared glyph path per character, laid out with the font's advances
+    content = text.text or ''
+    size = float(text.get('font-size', 16))
+    scale = size / font.units_per_em
+    glyphs = [font.glyph(char) for char in content]
+    width = sum(font.advance(glyph) for glyph in glyphs) * scale
+    x = float(text.get('x', 0))
+    y = float(text.get('y', 0))
+    anchor = text.get('text-anchor', 'start')
+    if anchor == 'middle':
+        x -= width / 2
+    elif anchor == 'end':
+        x -= width
+    group = ET.Element(f'{{{SVG}}}g', fill=text.get('fill', 'black'))
+    for glyph in glyphs:
+        used.add(glyph)
+        ET.SubElement(group, f'{{{SVG}}}use', {
+            f'{{{XLINK}}}href': f'#{_glyph_id(font, glyph)}',
+            'transform': f'translate({_number(x)} {_number(y)}) scale({_number(scale)} {_number(-scale)})',
+        })
+        x += font.advance(glyph) * scale
+    group.tail = text.tail
+    return group
+
+def to_png(svg, dpi=DEFAULT_DPI, font_file=None):
+    """ png bytes of an svg at dpi, the svg's pixels taken as CSS pixels """
+    _require_cairosvg()
+    return cairosvg.svg2png(bytestring=prepare_svg(svg, font_file), scale=dpi / CSS_DPI)
+
+def to_pdf_page(svg, font_file=None):
+    """ a one page pdf of an svg, vector throughout, at the svg's CSS size """
+    _require_cairosvg()
+    return cairosvg.svg2pdf(bytestring=prepare_svg(svg, font_file))
+
+def pdf_bytes(svgs, font_file=None):
+    """ the pdf of write_pdf as bytes """
+    buffer = io.BytesIO()
+    write_pdf(svgs, buffer, font_file)
+    return buffer.getvalue()
+
+def write_pdf(svgs, output, font_file=None):
+    """ write one pdf page per svg to output (a path or binary file), return the page count
+
+    svgs may be any iterable, e.g. a generator reading files, so only one
+    page is rasterized at a time.
+    """
+    _require_cairosvg()
+    pages = iter(svgs)
+    first = next(pages, None)
+    if first is None:
+        raise ValueError("No pages to write.")
+    second = next(pages, None)
+    if second is None:
+        data = to_pdf_page(first, font_file)
+        if hasattr(output, 'write'):
+            output.write(data)
+        else:
+            with open(output, 'wb') as file:
+                file.write(data)
+        return 1
+    if pypdf is None:
+        raise RuntimeError("A PDF with several pages needs pypdf (pip install pypdf).")
+    writer = pypdf.PdfWriter()
+    count = 0
+    for svg in itertools.chain((first, second), pages):
+        writer.append(pypdf.PdfReader(io.BytesIO(to_pdf_page(svg, font_file))))
+        count += 1
+    writer.write(output)
+    return count
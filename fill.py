@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+Automatic grid filling: put words from a word list into the empty cells of
+the answer slots that the arrow decorations point at.
+
+Words are kept in a WordStore, bucketed by length, with one bitset (a Python
+int, bit i for the i-th word of the bucket) per length, position and letter.
+The candidates for a slot are the AND of the bitsets of its known letters.
+The search fills the slot with the fewest candidates first, narrows every
+crossing slot after each word (forward checking, then arc consistency over
+the shared cells) and backtracks on a dead end, until the grid is full or the
+time budget is spent.
+
+fill_parallel() runs several differently seeded attempts across a process
+pool: search times vary a lot between seeds, so the first attempt to finish
+(or the best one) wins and the others are stopped.
+"""
+
+import multiprocessing
+import os
+import random
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import korsord
+
+FillResult = namedtuple('FillResult', 'complete puzzle words stats')
+
+_NONZERO = re.compile(rb'[^\x00]')
+
+def normalize_word(word):
+    """ the word as it goes into the grid, or '' if it can't: upper case letters only, ÅÄÖ included """
+    word = word.strip().upper()
+    return word if word.isalpha() else ''
+
+def iter_bits(bits, start=0):
+    """ indices of the set bits of bits, from start upwards and then from 0 up to start """
+    if not bits:
+        return
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    first = min(start // 8, len(data))
+    wrapped = []
+    for match in _NONZERO.finditer(data, first):
+        offset = match.start()
+        byte = data[offset]
+        base = offset * 8
+        while byte:
+            low = byte & -byte
+            byte ^= low
+            index = base + low.bit_length() - 1
+            if index >= start:
+                yield index
+            else:
+                wrapped.append(index)
+    yield from wrapped
+    for match in _NONZERO.finditer(data, 0, first):
+        offset = match.start()
+        byte = data[offset]
+        base = offset * 8
+        while byte:
+            low = byte & -byte
+            byte ^= low
+            yield base + low.bit_length() - 1
+
+class WordStore:
+    """ words bucketed by length, best score first, with per position letter bitsets """
+
+    def __init__(self, words, scores=None):
+        best = {}
+        for i, word in enumerate(words):
+            word = normalize_word(word)
+            if not word:
+                continue
+            score = scores[i] if scores is not None else 0
+            if word not in best or score > best[word]:
+                best[word] = score
+        buckets = {}
+        for word, score in best.items():
+            buckets.setdefault(len(word), []).append((word, score))
+        self.words = {}
+        self.scores = {}
+        self.masks = {}
+        for length, entries in buckets.items():
+            # sorted() is stable, words with equal scores keep the order of the list
+            entries = sorted(entries, key=lambda entry: -entry[1])
+            self.words[length] = [word for word, _ in entries]
+            self.scores[length] = [score for _, score in entries]
+            self.masks[length] = self._bitsets(self.words[length], length)
+
+    @staticmethod
+    def _bitsets(words, length):
+        size = (len(words) + 7) // 8
+        masks = []
+        for position in range(length):
+            letters = {}
+            for index, word in enumerate(words):
+                bits = letters.get(word[position])
+                if bits is None:
+                    bits = letters[word[position]] = bytearray(size)
+                bits[index >> 3] |= 1 << (index & 7)
+            masks.append({letter: int.from_bytes(bits, 'little') for letter, bits in letters.items()})
+        return masks
+
+    @classmethod
+    def from_file(cls, path):
+        """ one word per line, optionally followed by whitespace and a numeric score (higher is better) """
+        words, scores = [], []
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                parts = line.split()
+                if not parts:
+                    continue
+                words.append(parts[0])
+                try:
+                    scores.append(float(parts[1]) if len(parts) > 1 else 0)
+                except ValueError:
+                    scores.append(0)
+        return cls(words, scores)
+
+    def __len__(self):
+        return sum(len(words) for words in self.words.values())
+
+    def count(self, length):
+        return len(self.words.get(length, ()))
+
+    def all(self, length):
+        """ bitset of every word of length """
+        return (1 << self.count(length)) - 1
+
+    def mask(self, length, position, letter):
+        """ bitset of the words of length with letter at position """
+        masks = self.masks.get(length)
+        return masks[position].get(letter, 0) if masks else 0
+
+    def letter_masks(self, length, position):
+        """ {letter: bitset} of the words of length by their letter at position """
+        masks = self.masks.get(length)
+        return masks[position] if masks else {}
+
+    def word(self, length, index):
+        return self.words[length][index]
+
+    def score(self, length, index):
+        return self.scores[length][index]
+
+class _OutOfTime(Exception):
+    pass
+
+class _Cancelled(Exception):
+    pass
+
+class _Search:
+
+    def __init__(self, puzzle, store, slots, seed, time_budget, min_length, stop=None):
+        self.puzzle = puzzle
+        self.store = store
+        self.time_budget = time_budget
+        self.stop = stop
+        self.random = random.Random(seed) if seed is not None else None
+        cols = puzzle.cols
+        self.slots = []
+        self.cells = []
+        for slot in slots:
+            if slot.length < min_length:
+                continue
+            start = slot.row * cols + slot.col
+            step = 1 if slot.direction == 'across' else cols
+            self.slots.append(slot)
+            self.cells.append(tuple(start + k * step for k in range(slot.length)))
+        by_cell = {}
+        for s, cells in enumerate(self.cells):
+            for p, cell in enumerate(cells):
+                by_cell.setdefault(cell, []).append((s, p))
+        # crossings[s][p]: the (slot, position) pairs sharing the p-th cell of slot s
+        self.crossings = [[[(t, q) for t, q in by_cell[cell] if t != s] for p, cell in enumerate(cells)]
+                          for s, cells in enumerate(self.cells)]
+        self.letters = [chr(code) if code else None for code in puzzle.letters]
+        self.words = [None] * len(self.slots)
+        self.indices = [None] * len(self.slots)
+        self.domains = []
+        for s, cells in enumerate(self.cells):
+            length = len(cells)
+            domain = store.all(length)
+            for p, cell in enumerate(cells):
+                if self.letters[cell] is not None:
+                    domain &= store.mask(length, p, self.letters[cell])
+            self.domains.append(domain)
+        self.counts = [domain.bit_count() for domain in self.domains]
+        self.used = set()
+        self.nodes = 0
+        self.backtracks = 0
+
+    def run(self):
+        started = time.perf_counter()
+        self.deadline = started + self.time_budget if self.time_budget else None
+        # slots the puzzle already spells out in full need no word from the list
+        open_slots = []
+        for s, cells in enumerate(self.cells):
+            if all(self.letters[cell] is not None for cell in cells):
+                self.words[s] = ''.join(self.letters[cell] for cell in cells)
+            else:
+                open_slots.append(s)
+        self.best = (0, list(self.words), list(self.indices), list(self.letters))
+        timed_out = cancelled = False
+        try:
+            complete = self.propagate(list(open_slots), []) and self.search(open_slots, 0)
+        except _OutOfTime:
+            complete, timed_out = False, True
+        except _Cancelled:
+            complete, cancelled = False, True
+        if not complete:
+            _, self.words, self.indices, self.letters = self.best
+
+        puzzle = self.puzzle.copy()
+        for cell, letter in enumerate(self.letters):
+            if letter is not None and not puzzle.letters[cell]:
+                puzzle.letters[cell] = ord(letter)
+        words = [(self.slots[s], word) for s, word in enumerate(self.words) if word is not None]
+        stats = {
+            'slots': len(self.slots),
+            'filled': len(words),
+            'nodes': self.nodes,
+            'backtracks': self.backtracks,
+            'seconds': round(time.perf_counter() - started, 4),
+            'timed_out': timed_out,
+            'cancelled': cancelled,
+            'score': sum(self.store.score(len(self.cells[s]), index) for s, index in enumerate(self.indices) if index is not None),
+        }
+        return FillResult(complete, puzzle, words, stats)
+
+    def check_time(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise _OutOfTime()
+        if self.stop is not None and self.stop.is_set():
+            raise _Cancelled()
+
+    def propagate(self, queue, changed_domains):
+        """ arc consistency over shared cells, False on a dead end
+
+        A slot keeps only the words whose letter in a shared cell is still
+        possible for the crossing slot. Narrowed domains are recorded in
+        changed_domains so the caller can undo them.
+        """
+        store = self.store
+        domains = self.domains
+        counts = self.counts
+        letters = self.letters
+        queued = set(queue)
+        while queue:
+            t = queue.pop()
+            queued.discard(t)
+            cells = self.cells[t]
+            domain = domains[t]
+            for q, cell in enumerate(cells):
+                crossing = self.crossings[t][q]
+                if not crossing or letters[cell] is not None:
+                    continue
+                possible = [letter for letter, mask in store.letter_masks(len(cells), q).items() if mask & domain]
+                for u, r in crossing:
+                    masks = store.letter_masks(len(self.cells[u]), r)
+                    allowed = 0
+                    for letter in possible:
+                        allowed |= masks.get(letter, 0)
+                    narrowed = domains[u] & allowed
+                    if narrowed != domains[u]:
+                        changed_domains.append((u, domains[u], counts[u]))
+                        domains[u] = narrowed
+                        counts[u] = narrowed.bit_count()
+                        if not narrowed:
+                            return False
+                        if u not in queued:
+                            queue.append(u)
+                            queued.add(u)
+        return True
+
+    def search(self, open_slots, depth):
+        self.nodes += 1
+        self.check_time()
+        if depth > self.best[0]:
+            self.best = (depth, list(self.words), list(self.indices), list(self.letters))
+        if not open_slots:
+            return True
+
+        # most constrained slot first, the longer one on a tie
+        counts = self.counts
+        s = min(open_slots, key=lambda t: (counts[t], -len(self.cells[t])))
+        if not counts[s]:
+            return False
+        rest = [t for t in open_slots if t != s]
+
+        store = self.store
+        cells = self.cells[s]
+        length = len(cells)
+        letters = self.letters
+        domains = self.domains
+        start = self.random.randrange(store.count(length)) if self.random is not None else 0
+        for index in iter_bits(domains[s], start):
+            if (length, index) in self.used:
+                continue
+            word = store.word(length, index)
+            changed_cells = []
+            changed_domains = []
+            ok = True
+            for p, cell in enumerate(cells):
+                if letters[cell] is not None:
+                    continue
+                letter = word[p]
+                letters[cell] = letter
+                changed_cells.append(cell)
+                for t, q in self.crossings[s][p]:
+                    domain = domains[t]
+                    narrowed = domain & store.mask(len(self.cells[t]), q, letter)
+                    if narrowed != domain:
+                        changed_domains.append((t, domain, counts[t]))
+                        domains[t] = narrowed
+                        counts[t] = narrowed.bit_count()
+                        if not narrowed:
+                            ok = False
+                            break
+                if not ok:
+                    break
+            if ok:
+                ok = self.propagate([t for t, _, _ in changed_domains], changed_domains)
+            if ok:
+                self.words[s] = word
+                self.indices[s] = index
+                self.used.add((length, index))
+                if self.search(rest, depth + 1):
+                    return True
+                self.used.discard((length, index))
+                self.words[s] = self.indices[s] = None
+            self.backtracks += 1
+            # a backtrack costs milliseconds on a big list, so checking each one is cheap
+            self.check_time()
+            for t, domain, count in reversed(changed_domains):
+                domains[t] = domain
+                counts[t] = count
+            for cell in changed_cells:
+                letters[cell] = None
+        return False
+
+def fill(puzzle, store, time_budget=10.0, seed=None, slots=None, min_length=2, stop=None):
+    """ fill the empty cells of the puzzle's answer slots with words from store
+
+    slots defaults to korsord.find_slots(puzzle); slots shorter than
+    min_length are left alone. Letters already in the puzzle are kept. With a
+    seed the candidates are tried from a random point of each length bucket
+    instead of best score first, reproducibly. Returns a FillResult; when
+    the grid can't be completed within time_budget seconds it holds the
+    deepest partial fill that was found. Setting the stop event ends the
+    search the same way, with stats['cancelled'] set.
+    """
+    slots = korsord.find_slots(puzzle) if slots is None else slots
+    return _Search(puzzle, store, slots, seed, time_budget, min_length, stop).run()
+
+def fill_text(content, words, time_budget=10.0, seed=None):
+    """ fill the layout in a combined input text from the word list or index at words
+
+    Returns a dict with the filled words section, whether it is complete and
+    the search stats; this is what the app runs on its workers.
+    """
+    import wordindex
+    result = fill(korsord.build_puzzle(content), wordindex.load_words(words), time_budget=time_budget, seed=seed)
+    rows = [''.join(letter or ' ' for letter in row) for row in result.puzzle.grid()]
+    return {'complete': result.complete, 'words': '\n'.join(rows), 'stats': result.stats}
+
+def attempt_seeds(attempts, seed=0):
+    """ the seeds of fill_parallel's attempts: best score first, then seed + 1, seed + 2, ... """
+    return [None] + [seed + i for i in range(1, attempts)]
+
+def _rank(result, attempt):
+    # complete beats partial, then the better words, then the earlier attempt
+    return (result.complete, result.stats['score'], result.stats['filled'], -attempt)
+
+# the word store and stop event of a fill worker process, set by _init_worker
+_worker_store = None
+_worker_stop = None
+
+def _init_worker(words, stop):
+    global _worker_store, _worker_stop
+    import wordindex
+    _worker_store = wordindex.load_words(words) if isinstance(words, str) else words
+    _worker_stop = stop
+
+def _attempt(puzzle, seed, deadline, slots, min_length):
+    # runs in a worker, the wall clock is shared with the parent process
+    return fill(puzzle, _worker_store, time_budget=max(deadline - time.time(), 0.001), seed=seed,
+                slots=slots, min_length=min_length, stop=_worker_stop)
+
+def fill_parallel(puzzle, words, attempts=None, workers=None, time_budget=10.0, seed=0, first=True,
+                  slots=None, min_length=2):
+    """ run several seeded fill attempts across a process pool and return the winning FillResult
+
+    words is a WordStore or WordIndex, or the path of a word list or index,
+    which each worker then opens itself (see wordindex.load_words). Attempt i uses attempt_seeds(attempts, seed)[i], so any
+    result can be reproduced with fill(seed=result.stats['seed']). With first
+    the first complete fill wins and the other attempts are stopped;
+    otherwise every attempt runs and the best one wins, which is the same
+    result on every run. time_budget is for all attempts together, and the
+    best partial fill is returned if none completes. stats gets 'seed',
+    'attempt', 'attempts' and 'workers', and 'seconds' becomes the wall time.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    attempts = attempts or workers
+    slots = korsord.find_slots(puzzle) if slots is None else slots
+    seeds = attempt_seeds(attempts, seed)
+    deadline = time.time() + time_budget
+    context = multiprocessing.get_context()
+    stop = context.Event()
+    best = None
+    with ProcessPoolExecutor(max_workers=min(workers, attempts), mp_context=context,
+                             initializer=_init_worker, initargs=(words, stop)) as pool:
+        futures = {pool.submit(_attempt, puzzle, attempt_seed, deadline, slots, min_length): attempt
+                   for attempt, attempt_seed in enumerate(seeds)}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.cancelled():
+                    continue
+                attempt = futures[future]
+                result = future.result()
+                if best is None or _rank(result, attempt) > _rank(*best):
+                    best = (result, attempt)
+            if first and best is not None and best[0].complete:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+    result, attempt = best
+    stats = dict(result.stats, seed=seeds[attempt], attempt=attempt, attempts=attempts, workers=min(workers, attempts),
+                 seconds=round(time.perf_counter() - started, 4))
+    return result._replace(stats=stats)
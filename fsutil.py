@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+File helpers shared by the on-disk stores (artifacts, the render cache and
+the word index).
+"""
+
+import os
+import tempfile
+import time
+
+def write_atomic(path, data):
+    # write to a private name first so readers never see half a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def touch(path):
+    """ mark a file as recently used for prune_directory, ignoring files that are already gone """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def prune_directory(directory, suffix, max_entries=None, max_bytes=None, max_age=None):
+    """ remove the files ending in suffix that are older than max_age seconds, then the
+    least recently modified ones until at most max_entries files and max_bytes are left
+
+    Returns the number of files removed. Files that another process removes
+    at the same time are skipped.
+    """
+    files = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(suffix):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+
+    removed = 0
+    total = sum(size for _, size, _ in files)
+    count = len(files)
+    cutoff = time.time() - max_age if max_age is not None else None
+    for mtime, size, path in files:
+        if not ((cutoff is not None and mtime < cutoff)
+                or (max_entries is not None and count > max_entries)
+                or (max_bytes is not None and total > max_bytes)):
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        count -= 1
+        total -= size
+    return removed
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental re-rendering for the editor preview.
+
+A keyed drawing (korsord.draw_puzzle(keyed=True)) puts each part of a cell in
+its own group with a stable id: the rectangle, the letter in the words layer,
+the text of the clue boxes that start there and the decorations. Given the
+previous puzzle and a PuzzleDiff, render_changes() draws only the groups the
+change touches, so the front end can swap them in by id. When a change can't
+be patched (the grid changed size, or something outside the grid changed) it
+returns None instead of fragments and the caller falls back to a full render.
+"""
+
+from collections import namedtuple
+
+import svgfast
+
+import korsord
+
+# letters and highlights map (row, col) to the new letter ('' for none) or flag,
+# clues and decorations are the complete new lists, or None when unchanged
+PuzzleDiff = namedtuple('PuzzleDiff', 'letters highlights clues decorations')
+
+def diff_puzzles(old, new):
+    """ the PuzzleDiff that turns old into new, None if the grid changed size """
+    if (old.rows, old.cols) != (new.rows, new.cols):
+        return None
+    cols = new.cols
+    letters = {divmod(i, cols): chr(code) if code else ''
+               for i, (before, code) in enumerate(zip(old.letters, new.letters)) if before != code}
+    highlights = {divmod(i, cols): bool(flag)
+                  for i, (before, flag) in enumerate(zip(old.highlighted, new.highlighted)) if before != flag}
+    clues = new.clue_boxes if new.clue_boxes != old.clue_boxes else None
+    decorations = new.decorations if new.decorations != old.decorations else None
+    return PuzzleDiff(letters, highlights, clues, decorations)
+
+def apply_diff(puzzle, diff):
+    """ a new Puzzle with diff applied, puzzle itself is not changed """
+    new = puzzle.copy()
+    for (row, col), letter in diff.letters.items():
+        new.set_letter(row, col, letter)
+    for (row, col), flag in diff.highlights.items():
+        new.highlighted[row * new.cols + col] = 1 if flag else 0
+    if diff.clues is not None:
+        new.set_clue_boxes(diff.clues)
+    if diff.decorations is not None:
+        new.decorations = list(diff.decorations)
+    return new
+
+def box_cells(puzzle, clue_box):
+    # grid cells covered by a clue box
+    start_row, start_col, end_row, end_col = clue_box[:4]
+    return [(row, col) for row in range(start_row, end_row + 1) for col in range(start_col, end_col + 1)
+            if puzzle.in_bounds(row, col)]
+
+def changed_groups(old, new, diff):
+    """ (kind, row, col) of every group that differs between old and new, None if a full render is needed """
+    groups = {('letter', row, col) for row, col in diff.letters}
+    groups.update(('cell', row, col) for row, col in diff.highlights)
+    if diff.clues is not None:
+        old_clues = korsord.clues_by_cell(old)
+        new_clues = korsord.clues_by_cell(new)
+        if old_clues.get(None) != new_clues.get(None):
+            return None
+        for cell in set(old_clues) | set(new_clues):
+            if cell is not None and old_clues.get(cell) != new_clues.get(cell):
+                groups.add(('clue',) + cell)
+        # merging hides letters and moves rectangles, but only under the boxes
+        cols = new.cols
+        for row, col in {cell for box in old.clue_boxes + new.clue_boxes for cell in box_cells(new, box)}:
+            i = row * cols + col
+            before = (old.cell_types[i] == korsord.MERGED, old.box_span(old.owners[i]) if old.owners[i] >= 0 else None)
+            after = (new.cell_types[i] == korsord.MERGED, new.box_span(new.owners[i]) if new.owners[i] >= 0 else None)
+            if before != after:
+                groups.add(('cell', row, col))
+                groups.add(('letter', row, col))
+    if diff.decorations is not None:
+        old_decorations = korsord.decorations_by_cell(old)
+        new_decorations = korsord.decorations_by_cell(new)
+        if old_decorations.get(None) != new_decorations.get(None):
+            return None
+        for cell in set(old_decorations) | set(new_decorations):
+            if cell is not None and old_decorations.get(cell) != new_decorations.get(cell):
+                groups.add(('decor',) + cell)
+    return groups
+
+def render_changes(puzzle, diff, cell_size=40, backend='svgwrite', hide_words=False):
+    """ apply diff to puzzle and draw the changed groups
+
+    Returns the new puzzle and a dict of element id -> svg markup of the group,
+    or None instead of the dict when the change needs a full keyed render.
+    """
+    if diff is None:
+        return None, None
+    new = apply_diff(puzzle, diff)
+    groups = changed_groups(puzzle, new, diff)
+    if groups is None:
+        return new, None
+    if backend == 'fast':
+        dwg = svgfast.Drawing(None)
+    else:
+        import svgwrite
+        dwg = svgwrite.Drawing()
+    clues = korsord.clues_by_cell(new)
+    decorations = korsord.decorations_by_cell(new)
+    fragments = {}
+    for kind, row, col in sorted(groups):
+        fragment = korsord.draw_fragment(dwg, new, kind, row, col, cell_size, hide_words=hide_words,
+                                         clues=clues, decorations=decorations)
+        fragments[korsord.element_id(kind, row, col)] = fragment.tostring()
+    return new, fragments
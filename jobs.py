@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded render job queue in front of a thread or process pool.
+
+At most max_pending jobs are queued or running at once; submit() raises
+QueueFull beyond that so the app can answer 429 instead of piling up work.
+A job that is still queued when its timeout runs out is skipped by the
+worker, and one that runs past it is reported as timed out and its result
+dropped. A running render can't be interrupted, so it keeps its slot until
+it actually finishes. With profile=True every job also records where its
+time went (profiling.py) in Job.profile.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import profiling
+
+# how many recent jobs the latency percentiles are computed over
+LATENCY_WINDOW = 1024
+
+class QueueFull(Exception):
+    """ raised by JobQueue.submit when max_pending jobs are already waiting or running """
+
+def _run(deadline, fn, args, kwargs, profile=False):
+    # runs in the worker, the wall clock is shared with the parent process
+    started = time.time()
+    if deadline is not None and started > deadline:
+        return started, None, True, None
+    if not profile:
+        return started, fn(*args, **kwargs), False, None
+    with profiling.profile() as active:
+        result = fn(*args, **kwargs)
+    return started, result, False, active.to_dict()
+
+class Job:
+    __slots__ = ('id', 'status', 'submitted', 'started', 'finished', 'deadline', 'result', 'error', 'future', 'done', 'profile')
+
+    def __init__(self, deadline=None):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.deadline = deadline
+        self.result = None
+        self.error = None
+        self.future = None
+        self.done = threading.Event()
+        self.profile = None
+
+    def to_dict(self):
+        status = self.status
+        if status == 'queued' and self.future is not None and self.future.running():
+            status = 'running'
+        info = {'id': self.id, 'status': status, 'submitted': self.submitted}
+        if self.finished is not None:
+            info['seconds'] = round(self.finished - self.submitted, 4)
+        if self.error is not None:
+            info['error'] = str(self.error)
+        if self.profile is not None:
+            info['profile'] = self.profile
+        return info
+
+class JobQueue:
+    """ runs jobs on a pool of workers, with bounded backlog, per-job timeouts and latency counters """
+
+    def __init__(self, workers=2, max_pending=16, timeout=60, processes=False, keep=256, initializer=None, initargs=(), profile=False):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.processes = processes
+        self.keep = keep
+        self.profile = profile
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self._executor = pool(max_workers=workers, initializer=initializer, initargs=initargs)
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waits = deque(maxlen=LATENCY_WINDOW)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, fn, args=(), kwargs=None, on_done=None):
+        """ queue fn(*args, **kwargs) and return its Job; on_done(job) runs when it succeeds """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"{self._pending} render jobs are already waiting")
+            self._pending += 1
+            self.submitted += 1
+            job = Job(time.time() + self.timeout if self.timeout else None)
+            self._remember(job)
+        try:
+            job.future = self._executor.submit(_run, job.deadline, fn, args, kwargs or {}, self.profile)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        job.future.add_done_callback(lambda future: self._finish(job, future, on_done))
+        return job
+
+    def completed_job(self, result):
+        """ a finished job for a result that was already at hand, e.g. from a cache """
+        job = Job()
+        job.status = 'done'
+        job.result = result
+        job.finished = job.started = job.submitted
+        job.done.set()
+        with self._lock:
+            self._remember(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            self._check_timeout(job)
+        return job
+
+    def wait(self, job, timeout=None):
+        """ block until job finishes or times out, then return it """
+        if timeout is None and job.deadline is not None:
+            timeout = max(0, job.deadline - time.time())
+        job.done.wait(timeout)
+        self._check_timeout(job)
+        return job
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            stats = {
+                'workers': self.workers,
+                'mode': 'processes' if self.processes else 'threads',
+                'capacity': self.max_pending,
+                'pending': self._pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'queue_wait': summarize(self._waits),
+                'latency': summarize(self._latencies),
+            }
+        running = sum(1 for job in jobs if job.status == 'queued' and job.future is not None and job.future.running())
+        # a process pool hands one call more than it has workers to its queue
+        running = min(running, self.workers)
+        stats['running'] = running
+        stats['queued'] = max(0, stats['pending'] - running)
+        return stats
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _remember(self, job):
+        # called with the lock held, forgets the oldest finished jobs
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.keep:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.done.is_set():
+                break
+            self._jobs.popitem(last=False)
+
+    def _check_timeout(self, job):
+        if job.done.is_set() or job.deadline is None or time.time() <= job.deadline:
+            return
+        with self._lock:
+            if job.done.is_set():
+                return
+            job.status = 'timeout'
+            job.error = TimeoutError(f"render did not finish within {self.timeout} seconds")
+            job.finished = time.time()
+            self.timed_out += 1
+            job.done.set()
+        job.future.cancel()
+
+    def _finish(self, job, future, on_done):
+        finished = time.time()
+        result = error = profile = None
+        if future.cancelled():
+            started, expired = None, True
+        else:
+            try:
+                started, result, expired, profile = future.result()
+            except Exception as e:
+                started, expired, error = None, False, e
+        with self._lock:
+            self._pending -= 1
+            if started is not None:
+                self._waits.append(started - job.submitted)
+            if job.done.is_set():
+                return # already reported as timed out
+            job.started = started
+            job.finished = finished
+            job.profile = profile
+            if expired or (job.deadline is not None and finished > job.deadline):
+                job.status = 'timeout'
+                job.error = TimeoutError(f"render did not finish within {self.timeout} seconds")
+                self.timed_out += 1
+            elif error is not None:
+                job.status = 'failed'
+                job.error = error
+                self.failed += 1
+            else:
+                job.status = 'done'
+                job.result = result
+                self.completed += 1
+                self._latencies.append(finished - job.submitted)
+            job.done.set()
+        if job.status == 'done' and on_done is not None:
+            on_done(job)
+
+def summarize(seconds):
+    """ count, mean and percentiles in milliseconds of a window of durations """
+    if not seconds:
+        return {'count': 0}
+    ordered = sorted(seconds)
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
@@ -1,58 +1,193 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import svgwrite
-from svgwrite.extensions import Inkscape
-import argparse
-from textwrap import wrap
+# svgwrite, argparse, json and the process pool are imported where they are
+# used: svgwrite alone takes longer to import than a small render
+import svgfast
+import textmetrics
+import profiling
+import glob
+import io
+import os
+import re
+import sys
+import time
+from array import array
+from collections import namedtuple
+from contextlib import nullcontext
+from functools import lru_cache
 from datetime import datetime
 
 highlightcolor = 'lightsteelblue'
 clue_font = 10
+#font_family = 'Knewave' # ok but abit too bold..
+font_family = 'Mogra'
+
+# lines: the line numbers of the words, clues, highlights and decorations, for located errors
+PuzzleInput = namedtuple('PuzzleInput', 'words clues highlights decorations lines', defaults=(None,))
+Clue = namedtuple('Clue', 'text position direction span font_size')
+Decoration = namedtuple('Decoration', 'position command')
+
+SECTIONS = ('words', 'clues', 'highlights', 'decorations')
+CELL = re.compile(r'[A-Za-z]\d+$')
+CLUE_POSITION = re.compile(r'([A-Za-z]\d+)([HVhv])(\d+)$')
+TOKEN = re.compile(r'\S+')
+
+class InputError(ValueError):
+    """ all problems found in an input file, each as (line, column, message) """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('\n'.join(f"line {line}, column {column}: {message}" for line, column, message in errors))
+
+    def __reduce__(self):
+        # rebuilt from the error list when it crosses a process boundary
+        return InputError, (self.errors,)
 
 def read_input(filename):
-    with open(filename, 'r') as file:
-        content = file.read()
-    # split sections separated by blank lines
-    sections = content.split('\n\n')
+    with open(filename, 'r', encoding='utf-8') as file:
+        return parse_input(file)
 
-    if len(sections) < 4:
-        raise ValueError("Input file must contain four sections: words, clues, highlights and decorations.")
+def normalize_input(content):
+    # textareas and windows editors may hand us crlf line endings
+    return content.replace('\r\n', '\n').replace('\r', '\n')
 
-    words_section = sections[0].splitlines()
-    clues_section = sections[1].splitlines()
-    highlights_section = sections[2].splitlines()
-    decorations_section = sections[3].splitlines()
+def join_sections(words, clues, highlights, decorations):
+    """ combined input from the four sections, as textarea text or lists of lines, the way the editor joins them """
+    sections = [normalize_input(section) if isinstance(section, str) else '\n'.join(section)
+                for section in (words, clues, highlights, decorations)]
+    # same trimming as the editor's submit handler
+    sections[0] = re.sub(r'^\n{2,}', '\n', sections[0]).rstrip('\n')
+    sections[1:] = [section.strip('\n') for section in sections[1:]]
+    return '\n\n'.join(sections)
 
-    words = [line.rstrip('\n').upper() for line in words_section]
+def section_lines(lines):
+    """ yield (section, line number, text) for an iterable of lines, in one pass
 
-    clues_with_positions = []
-    for line in clues_section:
-        parts = line.split(maxsplit=2)
-        if len(parts) < 3:
-            raise ValueError("Each clue line must contain a position, font size, and a clue text.")
-        position = parts[0]
-        font_size = int(parts[1])
-        clue = parts[2]
-        start_position = position[:-2]
-        direction = position[-2]
-        span = int(position[-1])
-        clues_with_positions.append((clue, start_position, direction, span, font_size))
-
-    highlighted_positions = [line.strip() for line in highlights_section]
-    decorations = [(line.split()[0], line.split()[1]) for line in decorations_section]
-
-    return words, clues_with_positions, highlighted_positions, decorations
+    Sections end at an empty line, with the same pairing of newlines as
+    content.split('\n\n') followed by splitlines() on every section. The
+    separator itself is yielded with text None, as the first item of its section.
+    """
+    section = 0
+    number = 0
+    after_separator = False
+    held_blank = None # a blank line is only part of a section if something follows it
+    ends_with_newline = False
+    for line in lines:
+        number += 1
+        ends_with_newline = line.endswith('\n')
+        text = line.rstrip('\r\n')
+        if text == '' and ends_with_newline and number > 1 and not after_separator:
+            # this newline pairs with the previous one, the next section starts
+            section += 1
+            held_blank = None
+            after_separator = True
+            yield section, number, None
+            continue
+        after_separator = False
+        if held_blank is not None:
+            yield held_blank
+            held_blank = None
+        if text == '':
+            held_blank = (section, number, text)
+        else:
+            yield section, number, text
+    if ends_with_newline and held_blank is not None:
+        # the final newline starts one more (empty) line after the held blank
+        yield held_blank
+
+def parse_input(content):
+    """ parse the four-section input from a string, a file object or any iterable of lines
+
+    Every line is checked on the way; all problems are raised together as one
+    InputError before anything is built from the input.
+    """
+    if isinstance(content, str):
+        content = io.StringIO(normalize_input(content))
+    words, clues, highlights, decorations = [], [], [], []
+    lines = ([], [], [], [])
+    errors = []
+    sections_seen = 1
+    last_line = 0
+    for section, number, line in section_lines(content):
+        sections_seen = max(sections_seen, section + 1)
+        last_line = number
+        if line is None:
+            continue
+        if section == 0:
+            words.append(line.upper())
+            lines[0].append(number)
+        elif section == 1:
+            clue = parse_clue(line, number, errors)
+            if clue:
+                clues.append(clue)
+                lines[1].append(number)
+        elif section == 2:
+            position = line.strip()
+            if position:
+                if CELL.match(position):
+                    highlights.append(position)
+                    lines[2].append(number)
+                else:
+                    errors.append((number, line.index(position) + 1, f"highlight '{position}' is not a cell like B3"))
+        elif section == 3:
+            decoration = parse_decoration(line, number, errors)
+            if decoration:
+                decorations.append(decoration)
+                lines[3].append(number)
+    if sections_seen < len(SECTIONS):
+        errors.append((last_line + 1, 1, "Input file must contain four sections: words, clues, highlights and decorations."))
+    if errors:
+        raise InputError(errors)
+    return PuzzleInput(words, clues, highlights, decorations, lines)
+
+def parse_clue(line, number, errors):
+    # "A1H1 15 CLUE TEXT": position with direction and span, font size, text
+    tokens = list(TOKEN.finditer(line))
+    if len(tokens) < 3:
+        errors.append((number, 1, "Each clue line must contain a position, font size, and a clue text."))
+        return None
+    position, size = tokens[0], tokens[1]
+    text = line[tokens[2].start():]
+    ok = True
+    match = CLUE_POSITION.match(position.group())
+    if not match:
+        errors.append((number, position.start() + 1, f"clue position '{position.group()}' should look like A1H2 (cell, H or V, span)"))
+        ok = False
+    elif int(match.group(3)) < 1:
+        errors.append((number, position.start() + match.start(3) + 1, "clue span must be at least 1"))
+        ok = False
+    if not size.group().isdigit() or int(size.group()) < 1:
+        errors.append((number, size.start() + 1, f"font size '{size.group()}' is not a positive whole number"))
+        ok = False
+    if not ok:
+        return None
+    return Clue(text, match.group(1), match.group(2), int(match.group(3)), int(size.group()))
+
+def parse_decoration(line, number, errors):
+    # "B2 AR": cell and decoration code, anything after that is ignored. Unknown
+    # codes are kept and not drawn, like before, --check warns about them
+    tokens = list(TOKEN.finditer(line))
+    if not tokens:
+        return None
+    if len(tokens) < 2:
+        errors.append((number, tokens[0].end() + 1, "decoration needs a cell and a code, like B2 AR"))
+        return None
+    position, command = tokens[0], tokens[1]
+    if not CELL.match(position.group()):
+        errors.append((number, position.start() + 1, f"decoration cell '{position.group()}' is not a cell like B3"))
+        return None
+    return Decoration(position.group(), command.group())
 
 def read_words_from_file(filename):
-    with open(filename, 'r') as file:
+    with open(filename, 'r', encoding='utf-8') as file:
         # keep lines as is including spaces
         words = [line.rstrip('\n').upper() for line in file]
     return words
 
 def read_clues_from_file(filename):
     clues_with_positions = []
-    with open(filename, 'r') as file:
+    with open(filename, 'r', encoding='utf-8') as file:
         for line in file:
             parts = line.strip().split(maxsplit=2)
             position, clue = parts[0], parts[1]
@@ -65,14 +200,14 @@ def read_clues_from_file(filename):
 
 def read_highlights(filename):
     highlighted = []
-    with open(filename, 'r') as file:
+    with open(filename, 'r', encoding='utf-8') as file:
         for line in file:
             highlighted.append(line.strip())
     return highlighted
 
 def read_decorations(filename):
     decorations = []
-    with open(filename, 'r') as file:
+    with open(filename, 'r', encoding='utf-8') as file:
         for line in file:
             position, command = line.strip().split()
             decorations.append((position, command))
@@ -115,18 +250,239 @@ def create_clue_grid(clues_with_positions, grid_size):
                 merged_cells.add((row_index + i, col_index))
     return grid, merged_cells, clue_boxes
 
-def wrap_text(text, max_width, font_size):
+# cell types in Puzzle.cell_types
+OPEN = 0    # letter cell, filled or not
+CLUE = 1    # first cell of a clue box
+MERGED = 2  # covered by a clue box that starts in another cell
+# code points in the byte order of array('I')
+CODEPOINTS = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+
+class Puzzle:
+    """ flat, row-major puzzle model shared by the parser, the validator and the renderers
+
+    letters holds one code point per cell (0 for no letter), cell_types one of
+    OPEN/CLUE/MERGED, highlighted 0/1 and owners the index into clue_boxes of the
+    box covering the cell (-1 for none, the first box listed wins).
+    """
+    __slots__ = ('rows', 'cols', 'letters', 'cell_types', 'highlighted', 'owners', 'clue_boxes', 'decorations')
+
+    def __init__(self, rows, cols):
+        size = rows * cols
+        self.rows = rows
+        self.cols = cols
+        self.letters = array('I', bytes(4 * size))
+        self.cell_types = bytearray(size)
+        self.highlighted = bytearray(size)
+        self.owners = array('i', [-1]) * size
+        self.clue_boxes = []
+        self.decorations = []
+
+    @classmethod
+    def from_input(cls, puzzle_input):
+        words, clues, highlights, decorations = puzzle_input[:4]
+        puzzle = cls(len(words), max((len(word) for word in words), default=0))
+        for row, word in enumerate(words):
+            puzzle.set_row(row, word)
+        for clue, position, direction, span, font_size in clues:
+            row, col = alpha_to_index(position)
+            if direction.upper() == 'H':
+                puzzle.add_clue_box(row, col, row, col + span - 1, clue, font_size)
+            elif direction.upper() == 'V':
+                puzzle.add_clue_box(row, col, row + span - 1, col, clue, font_size)
+        for position in highlights:
+            puzzle.highlight(*alpha_to_index(position))
+        puzzle.decorations = list(decorations)
+        return puzzle
+
+    @classmethod
+    def from_grid(cls, grid, highlighted_positions, merged_cells, clue_boxes, decorations):
+        """ build from the list-of-lists structures of create_grid_from_words/create_clue_grid """
+        puzzle = cls(len(grid), len(grid[0]) if grid else 0)
+        for row, cells in enumerate(grid):
+            puzzle.set_row(row, cells)
+        for box in clue_boxes:
+            puzzle.add_clue_box(*box)
+        for row, col in merged_cells:
+            if puzzle.in_bounds(row, col):
+                puzzle.cell_types[row * puzzle.cols + col] = MERGED
+        for position in highlighted_positions:
+            puzzle.highlight(*alpha_to_index(position))
+        puzzle.decorations = list(decorations)
+        return puzzle
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def letter(self, row, col):
+        code = self.letters[row * self.cols + col]
+        return chr(code) if code else ''
+
+    def set_letter(self, row, col, letter):
+        self.letters[row * self.cols + col] = ord(letter) if letter and letter != ' ' else 0
+
+    def set_row(self, row, cells):
+        # a word line or a list of cells, spaces and '' are empty cells
+        if not isinstance(cells, str):
+            cells = ''.join(char or ' ' for char in cells)
+        codes = array('I', cells.replace(' ', '\0').encode(CODEPOINTS))
+        base = row * self.cols
+        self.letters[base:base + len(codes)] = codes
+
+    def highlight(self, row, col):
+        if self.in_bounds(row, col):
+            self.highlighted[row * self.cols + col] = 1
+
+    def copy(self):
+        puzzle = Puzzle(0, 0)
+        puzzle.rows = self.rows
+        puzzle.cols = self.cols
+        puzzle.letters = array('I', self.letters)
+        puzzle.cell_types = bytearray(self.cell_types)
+        puzzle.highlighted = bytearray(self.highlighted)
+        puzzle.owners = array('i', self.owners)
+        puzzle.clue_boxes = list(self.clue_boxes)
+        puzzle.decorations = list(self.decorations)
+        return puzzle
+
+    def set_clue_boxes(self, clue_boxes):
+        """ replace all clue boxes, recomputing cell types and owners """
+        size = self.rows * self.cols
+        self.cell_types = bytearray(size)
+        self.owners = array('i', [-1]) * size
+        self.clue_boxes = []
+        for box in clue_boxes:
+            self.add_clue_box(*box)
+
+    def add_clue_box(self, start_row, start_col, end_row, end_col, clue, font_size):
+        index = len(self.clue_boxes)
+        self.clue_boxes.append((start_row, start_col, end_row, end_col, clue, font_size))
+        if start_row != end_row and start_col != end_col:
+            return
+        cols = self.cols
+        for row in range(start_row, end_row + 1):
+            for col in range(start_col, end_col + 1):
+                if not self.in_bounds(row, col):
+                    continue
+                i = row * cols + col
+                if self.owners[i] < 0:
+                    self.owners[i] = index
+                if row == start_row and col == start_col:
+                    if self.cell_types[i] != MERGED:
+                        self.cell_types[i] = CLUE
+                else:
+                    self.cell_types[i] = MERGED
+
+    def box_span(self, index):
+        """ (columns, rows) covered by clue box index """
+        start_row, start_col, end_row, end_col, _, _ = self.clue_boxes[index]
+        if start_row == end_row:
+            return end_col - start_col + 1, 1
+        return 1, end_row - start_row + 1
+
+    def grid(self):
+        """ letters as the list of lists that create_grid_from_words builds """
+        cols = self.cols
+        return [[chr(code) if code else '' for code in self.letters[row * cols:(row + 1) * cols]] for row in range(self.rows)]
+
+# arrow decorations: where the answer starts relative to the arrow's cell, and which way it runs
+ARROWS = {
+    'AR': (0, 1, 'across'),
+    'AD': (1, 0, 'down'),
+    'RR': (1, 1, 'across'),
+    'RD': (1, 1, 'down'),
+    'UR': (-1, 0, 'across'),
+    'DR': (1, 0, 'across'),
+}
+
+# position is the arrow's cell and decoration its index in Puzzle.decorations
+Slot = namedtuple('Slot', 'row col direction length position decoration')
+
+def find_slots(puzzle):
+    """ the answer slots the arrow decorations point at, in decoration order
+
+    A slot runs from the cell the arrow points into over open cells until a
+    clue box or the grid edge. Arrows that point at a clue box or off the
+    grid give slots of length 0; two arrows into the same slot give one slot.
+    """
+    slots = []
+    seen = set()
+    cols = puzzle.cols
+    cell_types = puzzle.cell_types
+    for index, (position, command) in enumerate(puzzle.decorations):
+        arrow = ARROWS.get(command)
+        if arrow is None:
+            continue
+        d_row, d_col, direction = arrow
+        row, col = alpha_to_index(position)
+        row, col = row + d_row, col + d_col
+        if (row, col, direction) in seen:
+            continue
+        seen.add((row, col, direction))
+        step_row, step_col = (0, 1) if direction == 'across' else (1, 0)
+        length = 0
+        while puzzle.in_bounds(row + length * step_row, col + length * step_col) \
+                and cell_types[(row + length * step_row) * cols + col + length * step_col] == OPEN:
+            length += 1
+        slots.append(Slot(row, col, direction, length, position, index))
+    return slots
+
+def wrap_text(text, max_width, font_size, font_family=None):
     """ wrap text so it fits in a cell """
+    return list(_wrap_text_cached(text, max_width, font_size, font_family))
+
+@lru_cache(maxsize=8192)
+def _wrap_text_cached(text, max_width, font_size, font_family):
+    # the same clues come back render after render, so wrapping is memoized
+    metrics = textmetrics.metrics_for(font_family)
     wrapped = []
-    lines = text.split('\\n')
-    lines = [line if line != '' else '\n' for line in lines]
-    max_chars_per_line = max_width // (font_size // 2)
-    for line in lines:
-        if line == '\n':
+    for line in text.split('\\n'):
+        if line == '':
             wrapped.append('')
         else:
-            wrapped.extend(wrap(line, max_chars_per_line))
-    return wrapped
+            wrapped.extend(wrap_line(line, max_width, font_size, metrics))
+    return tuple(wrapped)
+
+textmetrics.on_metrics_change(_wrap_text_cached.cache_clear)
+
+def wrap_line(line, max_width, font_size, metrics):
+    # greedy word wrap on measured glyph widths, lines break at spaces and after hyphens
+    space = metrics.text_width(' ', font_size)
+    lines = []
+    current, current_width = '', 0
+    for word in line.split():
+        width = metrics.text_width(word, font_size)
+        if current and current_width + space + width <= max_width:
+            current += ' ' + word
+            current_width += space + width
+            continue
+        if current:
+            lines.append(current)
+        # only a word wider than the whole box is split, with a hyphen where it had none
+        while width > max_width and len(word) > 1:
+            cut, hyphenate = break_point(word, max_width, font_size, metrics)
+            lines.append(word[:cut] + '-' if hyphenate else word[:cut])
+            word = word[cut:]
+            width = metrics.text_width(word, font_size)
+        current, current_width = word, width
+    if current:
+        lines.append(current)
+    return lines
+
+def break_point(word, max_width, font_size, metrics):
+    # where to split a word too wide for the box: after its last hyphen that fits, else
+    # (cut, True) for the longest prefix that fits with a hyphen added, at least one character
+    hyphen_width = metrics.text_width('-', font_size)
+    width = 0
+    cut = 1
+    for i, ch in enumerate(word[:-1]):
+        width += metrics.text_width(ch, font_size)
+        if width + hyphen_width > max_width:
+            break
+        cut = i + 1
+    hyphen = word.rfind('-', 0, cut + 1)
+    if hyphen > 0:
+        return hyphen + 1, False
+    return cut, True
 
 def draw_arrow(dwg, start_pos, end_pos):
     direction_x = end_pos[0] - start_pos[0]
@@ -134,240 +490,67 @@ def draw_arrow(dwg, start_pos, end_pos):
     length = (direction_x ** 2 + direction_y ** 2) ** 0.5
     if length == 0:
         return
-    unit_x = direction_x / length
-    unit_y = direction_y / length
-    shaft_end_x = end_pos[0] - unit_x * 3
-    shaft_end_y = end_pos[1] - unit_y * 3
+    _arrow_at(dwg, start_pos, end_pos, direction_x / length, direction_y / length)
+
+def _arrow_at(dwg, start_pos, end_pos, unit_x, unit_y, shaft=3, head=5):
+    # the shaft stops short of the tip so its end doesn't poke through the head
+    shaft_end_x = end_pos[0] - unit_x * shaft
+    shaft_end_y = end_pos[1] - unit_y * shaft
     dwg.add(dwg.line(start=start_pos, end=(shaft_end_x, shaft_end_y), stroke='black'))
-    arrow_base_x = end_pos[0] - unit_x * 5
-    arrow_base_y = end_pos[1] - unit_y * 5
+    arrow_base_x = end_pos[0] - unit_x * head
+    arrow_base_y = end_pos[1] - unit_y * head
     normal_x = -unit_y
     normal_y = unit_x
-    left_x = arrow_base_x + normal_x * 5 / 2
-    left_y = arrow_base_y + normal_y * 5 / 2
-    right_x = arrow_base_x - normal_x * 5 / 2
-    right_y = arrow_base_y - normal_y * 5 / 2
+    left_x = arrow_base_x + normal_x * head / 2
+    left_y = arrow_base_y + normal_y * head / 2
+    right_x = arrow_base_x - normal_x * head / 2
+    right_y = arrow_base_y - normal_y * head / 2
     dwg.add(dwg.polygon(points=[end_pos, (left_x, left_y), (right_x, right_y)], fill='black'))
 
 def draw_line(dwg, start_pos, end_pos, stroke_width=1):
     dwg.add(dwg.line(start=start_pos, end=end_pos, stroke='black', stroke_width=stroke_width))
 
-def draw_dividerh(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x, top_left_y + cell_size/2)
-    line_end = (top_left_x + cell_size, top_left_y + cell_size/2)
-    draw_line(dwg, line_start, line_end)
-
-def draw_dh2(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x, top_left_y + cell_size/2 -3)
-    line_end = (top_left_x + cell_size, top_left_y + cell_size/2 -3)
-    draw_line(dwg, line_start, line_end)
-
-def draw_dh3(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x, top_left_y + cell_size/2 +3)
-    line_end = (top_left_x + cell_size, top_left_y + cell_size/2 +3)
-    draw_line(dwg, line_start, line_end)
-
-def draw_dh4(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x, top_left_y + cell_size/2 -7)
-    line_end = (top_left_x + cell_size, top_left_y + cell_size/2 -7)
-    draw_line(dwg, line_start, line_end)
-
-def draw_dividerv(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + cell_size/2, top_left_y)
-    line_end = (top_left_x + cell_size/2, top_left_y + cell_size)
-    draw_line(dwg, line_start, line_end)
-
-def draw_continuer(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 5, top_left_y + 28)
-    line_end = (top_left_x + 5, top_left_y + 35)
-    arrow_start = (top_left_x + 5, top_left_y + 34.5)
-    arrow_end = (top_left_x + 13, top_left_y + 34.5)
-    draw_line(dwg, line_start, line_end)
-    draw_arrow(dwg, arrow_start, arrow_end)
-
-def draw_continuel(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x+cell_size - 5, top_left_y + 28)
-    line_end = (top_left_x+cell_size - 5, top_left_y + 35)
-    arrow_start = (top_left_x+cell_size - 5, top_left_y + 34.5)
-    arrow_end = (top_left_x+cell_size - 13, top_left_y + 34.5)
-    draw_line(dwg, line_start, line_end)
-    draw_arrow(dwg, arrow_start, arrow_end)
-
-def draw_continued(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 30, top_left_y + 3)
-    line_end = (top_left_x + 35, top_left_y + 3)
-    arrow_start = (top_left_x + 35, top_left_y + 2.5)
-    arrow_end = (top_left_x + 35, top_left_y + 11)
-    draw_line(dwg, line_start, line_end)
-    draw_arrow(dwg, arrow_start, arrow_end)
-
-def draw_arrowdown(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 20, top_left_y + 37)
-    line_end = (top_left_x + 20, top_left_y + 47)
-    draw_arrow(dwg, line_start, line_end)
-
-def draw_arrowup(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 20, top_left_y +3)
-    line_end = (top_left_x + 20, top_left_y -7)
-    draw_arrow(dwg, line_start, line_end)
-
-def draw_arrowright(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 37, top_left_y + 20)
-    line_end = (top_left_x + 47, top_left_y + 20)
-    draw_arrow(dwg, line_start, line_end)
-
-def draw_arrowrd(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 37, top_left_y + 37)
-    line_end = (top_left_x + 44, top_left_y + 44)
-    arrow_start = (top_left_x + 43.8, top_left_y + 43.5)
-    arrow_end = (top_left_x + 43.8, top_left_y + 52)
-    draw_line(dwg, line_start, line_end)
-    draw_arrow(dwg, arrow_start, arrow_end)
-
-def draw_arrowrr(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 37, top_left_y + 37)
-    line_end = (top_left_x + 44, top_left_y + 44)
-    arrow_start = (top_left_x + 43.8, top_left_y + 44)
-    arrow_end = (top_left_x + 52, top_left_y + 44)
-    draw_line(dwg, line_start, line_end)
-    draw_arrow(dwg, arrow_start, arrow_end)
-
-def draw_arrowur(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 3, top_left_y + 7)
-    line_end = (top_left_x + 3, top_left_y - 5)
-    arrow_start = (top_left_x + 2.5, top_left_y - 5)
-    arrow_end = (top_left_x + 10, top_left_y - 5)
-    draw_line(dwg, line_start, line_end)
-    draw_arrow(dwg, arrow_start, arrow_end)
-
-def draw_arrowdr(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x + 3, top_left_y + cell_size - 7)
-    line_end = (top_left_x + 3, top_left_y + cell_size + 5)
-    arrow_start = (top_left_x + 2.5, top_left_y + cell_size + 5)
-    arrow_end = (top_left_x + 10, top_left_y + cell_size + 5)
-    draw_line(dwg, line_start, line_end)
-    draw_arrow(dwg, arrow_start, arrow_end)
-
-def draw_trid(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    x = col * cell_size
-    y = row * cell_size
-    triangle_coordinates = [(x + 15, y), (x + 25, y), (x + 20, y + 5)]
-    dwg.add(dwg.polygon(points=triangle_coordinates, fill='white', stroke='black', stroke_width=1))
-
-def draw_trir(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    x = col * cell_size
-    y = row * cell_size
-    triangle_coordinates = [(x, y + 15), (x, y + 25), (x + 5, y + 20)]
-    dwg.add(dwg.polygon(points=triangle_coordinates, fill='white', stroke='black', stroke_width=1))
-
-def draw_lineh(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x, top_left_y + cell_size/2)
-    line_end = (top_left_x + cell_size, top_left_y + cell_size/2)
-    draw_line(dwg, line_start, line_end, stroke_width=4)
-
-def draw_brd(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x, top_left_y + cell_size/2)
-    line_end = (top_left_x + cell_size/2, top_left_y + cell_size/2)
-    draw_line(dwg, line_start, line_end, stroke_width=4)
-    line_start = (top_left_x + cell_size/2, top_left_y + cell_size/2 - 2)
-    line_end = (top_left_x + cell_size/2, top_left_y + cell_size - 5)
-    draw_line(dwg, line_start, line_end, stroke_width=4)
-    x = top_left_x
-    y = top_left_y
-    tri_cords = [(x+12, y+cell_size-10), (x+cell_size-12, y+cell_size-10), 
-            (x+cell_size/2, y+cell_size-1)]
-    dwg.add(dwg.polygon(points=tri_cords, fill='black', stroke='black', stroke_width='1'))
-
-def draw_br(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x, top_left_y + cell_size/2)
-    line_end = (top_left_x + 4*cell_size/5, top_left_y + cell_size/2)
-    draw_line(dwg, line_start, line_end, stroke_width=4)
-    x = top_left_x
-    y = top_left_y
-    tri_cords = [(x+cell_size-10, y+12), (x+cell_size-10, y+cell_size-12), 
-            (x+cell_size-1, y+cell_size/2)]
-    dwg.add(dwg.polygon(points=tri_cords, fill='black', stroke='black', stroke_width='1'))
-
-def draw_bur(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    top_left_x = col * cell_size
-    top_left_y = row * cell_size
-    line_start = (top_left_x+cell_size/2, top_left_y + cell_size/2)
-    line_end = (top_left_x + 4*cell_size/5, top_left_y + cell_size/2)
-    draw_line(dwg, line_start, line_end, stroke_width=4)
-    line_start = (top_left_x+cell_size/2, top_left_y + cell_size/2-2)
-    line_end = (top_left_x+cell_size/2, top_left_y + cell_size)
-    draw_line(dwg, line_start, line_end, stroke_width=4)
-    x = top_left_x
-    y = top_left_y
-    tri_cords = [(x+cell_size-10, y+12), (x+cell_size-10, y+cell_size-12), 
-            (x+cell_size-1, y+cell_size/2)]
-    dwg.add(dwg.polygon(points=tri_cords, fill='black', stroke='black', stroke_width='1'))
-
-def draw_copyright(dwg, alpha, cell_size=40):
-    row, col = alpha_to_index(alpha)
-    x = col * cell_size
-    y = row * cell_size
+# decoration geometry is given for a cell of this size, with (0, 0) at the cell's top left corner
+DECORATION_CELL = 40
+
+def _scale(point, scale):
+    # at the reference size the numbers are kept as they are, ints stay ints in the svg
+    return point if scale == 1 else (point[0] * scale, point[1] * scale)
+
+class Line(namedtuple('Line', 'start end stroke_width', defaults=(1,))):
+    """ a black line """
+
+    def resolve(self, scale):
+        (x1, y1), (x2, y2) = _scale(self.start, scale), _scale(self.end, scale)
+        # the bars' end offsets overlap half a stroke, so the stroke grows with them
+        width = self.stroke_width if scale == 1 else round(self.stroke_width * scale, 2)
+        return lambda dwg, x, y: draw_line(dwg, (x + x1, y + y1), (x + x2, y + y2), width)
+
+class Arrow(namedtuple('Arrow', 'start end')):
+    """ a thin line with an arrow head at end """
+
+    def resolve(self, scale):
+        (x1, y1), (x2, y2) = _scale(self.start, scale), _scale(self.end, scale)
+        length = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
+        if length == 0:
+            return lambda dwg, x, y: None
+        unit_x, unit_y = (x2 - x1) / length, (y2 - y1) / length
+        shaft, head = _scale((3, 5), scale)
+        return lambda dwg, x, y: _arrow_at(dwg, (x + x1, y + y1), (x + x2, y + y2), unit_x, unit_y, shaft, head)
+
+class Polygon(namedtuple('Polygon', 'points fill')):
+    """ a filled polygon with a black outline """
+
+    def resolve(self, scale):
+        points, fill = [_scale(point, scale) for point in self.points], self.fill
+        return lambda dwg, x, y: dwg.add(dwg.polygon(points=[(x + px, y + py) for px, py in points],
+                                                     fill=fill, stroke='black', stroke_width=1))
+
+def draw_copyright(dwg, x, y, cell_size=40):
     dwg.add(dwg.rect(insert=(x, y), size=(cell_size, cell_size), fill='black'))
     year = datetime.now().year
     copyright_text = f"© Mikael Ivarsson {year}"
-    wrapped_copyright = wrap_text(copyright_text, cell_size, font_size=10)
+    wrapped_copyright = wrap_text(copyright_text, cell_size, font_size=10, font_family='Arial')
     text_height = len(wrapped_copyright * 10)
     vertical_offset = (cell_size - text_height) / 2 + 8
     for i, line in enumerate(wrapped_copyright):
@@ -378,162 +561,742 @@ def draw_copyright(dwg, alpha, cell_size=40):
                          font_family='Arial',
                          fill='white'))
 
-def create_crossword(filename, grid, clue_grid, highlighted_positions, merged_cells, clue_boxes, decorations, hide_words = False, cell_size=40):
-    # calculate size of the grid
-    num_rows = len(grid)
-    num_cols = len(grid[0]) if num_rows > 0 else 0
+# the decoration codes: a list of shapes in a DECORATION_CELL sized cell, or a
+# function draw(dwg, x, y, cell_size) for anything else; see register_decoration
+DECORATIONS = {
+    'CR': [Line((5, 28), (5, 35)), Arrow((5, 34.5), (13, 34.5))],
+    'CD': [Line((30, 3), (35, 3)), Arrow((35, 2.5), (35, 11))],
+    'CL': [Line((35, 28), (35, 35)), Arrow((35, 34.5), (27, 34.5))],
+    'AR': [Arrow((37, 20), (47, 20))],
+    'AD': [Arrow((20, 37), (20, 47))],
+    'AU': [Arrow((20, 3), (20, -7))],
+    'RR': [Line((37, 37), (44, 44)), Arrow((43.8, 44), (52, 44))],
+    'RD': [Line((37, 37), (44, 44)), Arrow((43.8, 43.5), (43.8, 52))],
+    'UR': [Line((3, 7), (3, -5)), Arrow((2.5, -5), (10, -5))],
+    'DR': [Line((3, 33), (3, 45)), Arrow((2.5, 45), (10, 45))],
+    'TR': [Polygon([(0, 15), (0, 25), (5, 20)], 'white')],
+    'TD': [Polygon([(15, 0), (25, 0), (20, 5)], 'white')],
+    'C': draw_copyright,
+    'DH': [Line((0, 20.0), (40, 20.0))],
+    'DV': [Line((20.0, 0), (20.0, 40))],
+    'LH': [Line((0, 20.0), (40, 20.0), 4)],
+    'BRD': [Line((0, 20.0), (20.0, 20.0), 4), Line((20.0, 18.0), (20.0, 35), 4),
+            Polygon([(12, 30), (28, 30), (20.0, 39)], 'black')],
+    'BR': [Line((0, 20.0), (32.0, 20.0), 4), Polygon([(30, 12), (30, 28), (39, 20.0)], 'black')],
+    'BUR': [Line((20.0, 20.0), (32.0, 20.0), 4), Line((20.0, 18.0), (20.0, 40), 4),
+            Polygon([(30, 12), (30, 28), (39, 20.0)], 'black')],
+    'DH2': [Line((0, 17.0), (40, 17.0))],
+    'DH3': [Line((0, 23.0), (40, 23.0))],
+    'DH4': [Line((0, 13.0), (40, 13.0))],
+}
 
-    # create an svg drawing object
-    dwg = svgwrite.Drawing(filename, profile='full', size=(cell_size * num_cols, cell_size * num_rows))
-    inkscape = Inkscape(dwg)
-    words_layer = inkscape.layer(label="Words", locked=False)
+def register_decoration(code, shapes, arrow=None):
+    """ add or replace a decoration code
+
+    shapes is a list of Line, Arrow and Polygon in a DECORATION_CELL sized
+    cell, scaled to the cell size when drawn, or a function
+    draw(dwg, x, y, cell_size) that draws at the cell's top left corner.
+    An arrow (row offset, column offset, 'across' or 'down') makes the code
+    lead into an answer slot, like ARROWS.
+    """
+    DECORATIONS[code] = shapes
+    if arrow is not None:
+        ARROWS[code] = arrow
+    resolve_decorations.cache_clear()
+    decorations_fingerprint.cache_clear()
+
+@lru_cache(maxsize=1)
+def decorations_fingerprint():
+    """ a short hash of the decoration codes, their shapes and arrows, for render cache keys """
+    import hashlib
+    table = [(code, f'{shapes.__module__}.{shapes.__qualname__}' if callable(shapes) else repr(shapes), ARROWS.get(code))
+             for code, shapes in sorted(DECORATIONS.items())]
+    return hashlib.sha256(repr(table).encode('utf-8')).hexdigest()[:16]
+
+@lru_cache(maxsize=16)
+def resolve_decorations(cell_size=40):
+    """ {code: draw(dwg, x, y)} for every decoration, with its geometry scaled to cell_size """
+    scale = cell_size / DECORATION_CELL if cell_size != DECORATION_CELL else 1
+    resolved = {}
+    for code, shapes in DECORATIONS.items():
+        if callable(shapes):
+            resolved[code] = lambda dwg, x, y, draw=shapes: draw(dwg, x, y, cell_size)
+        else:
+            parts = [shape.resolve(scale) for shape in shapes]
+            resolved[code] = lambda dwg, x, y, parts=parts: [part(dwg, x, y) for part in parts]
+    return resolved
 
-    #font_family = 'Knewave' # ok but abit too bold..
-    font_family = 'Mogra'
+def draw_decorations(dwg, decorations, cell_size=40):
+    """ draw (position, command) decorations, return how many had a known code """
+    resolved = resolve_decorations(cell_size)
+    drawn = 0
+    for position, command in decorations:
+        draw = resolved.get(command)
+        if draw:
+            row, col = alpha_to_index(position)
+            draw(dwg, col * cell_size, row * cell_size)
+            drawn += 1
+    return drawn
+
+class _GroupTarget:
+    """ lets the decorations add their elements to a symbol or group instead of the drawing """
+
+    def __init__(self, dwg, group):
+        self.dwg = dwg
+        self.group = group
+
+    def __getattr__(self, name):
+        return getattr(self.dwg, name)
+
+    def add(self, element):
+        return self.group.add(element)
+
+def draw_decorations_compact(dwg, decorations, cell_size=40, min_uses=2):
+    # a decoration type used at least min_uses times is drawn once in <defs> at the origin
+    # cell and placed with <use>, rarer ones are drawn in place since a symbol would only add bytes
+    resolved = resolve_decorations(cell_size)
+    uses = {}
+    for _, command in decorations:
+        uses[command] = uses.get(command, 0) + 1
+    symbols = {}
+    drawn = 0
+    for position, command in decorations:
+        draw = resolved.get(command)
+        if not draw:
+            continue
+        row, col = alpha_to_index(position)
+        drawn += 1
+        if uses[command] < min_uses:
+            draw(dwg, col * cell_size, row * cell_size)
+            continue
+        if command not in symbols:
+            symbol = dwg.symbol(id=f'deco-{command}')
+            # arrows reach into the neighbouring cells
+            symbol['overflow'] = 'visible'
+            draw(_GroupTarget(dwg, symbol), 0, 0)
+            dwg.defs.add(symbol)
+            symbols[command] = symbol
+        dwg.add(dwg.use(f'#deco-{command}', insert=(col * cell_size, row * cell_size)))
+    return drawn
 
-    highlighted_indices = [alpha_to_index(pos) for pos in highlighted_positions]
+def create_crossword(filename, grid, clue_grid, highlighted_positions, merged_cells, clue_boxes, decorations, hide_words = False, cell_size=40, backend='svgwrite', compact=False):
+    # entry point for the list-of-lists structures, everything is drawn from a Puzzle
+    puzzle = Puzzle.from_grid(grid, highlighted_positions, merged_cells, clue_boxes, decorations)
+    return draw_puzzle(puzzle, filename, hide_words=hide_words, cell_size=cell_size, backend=backend, compact=compact)
+
+def draw_cell(dwg, puzzle, row, col, cell_size=40):
+    # the rectangle of a letter cell or of a whole clue box, None for merged cells
+    i = row * puzzle.cols + col
+    if puzzle.cell_types[i] == MERGED:
+        return None
+    fill_color = highlightcolor if puzzle.highlighted[i] else 'white'
+    # clue boxes cover several cells, everything else is one cell
+    owner = puzzle.owners[i]
+    span_cols, span_rows = puzzle.box_span(owner) if owner >= 0 else (1, 1)
+    return dwg.rect(insert=(col*cell_size, row*cell_size), size=(span_cols*cell_size, span_rows*cell_size), fill=fill_color, stroke='black')
+
+def draw_letter(dwg, puzzle, row, col, cell_size=40):
+    # the solution letter of a cell, None for empty and merged cells
+    i = row * puzzle.cols + col
+    code = puzzle.letters[i]
+    if not code or puzzle.cell_types[i] == MERGED:
+        return None
+    return dwg.text(
+        chr(code),
+        insert=(col*cell_size + cell_size/2, row*cell_size + cell_size/2 + 10),
+        text_anchor="middle",
+        font_size=30,
+        font_family=font_family,
+        fill='black'
+    )
+
+def draw_clue(dwg, clue_box, cell_size=40):
+    # the wrapped text lines of a clue box
+    start_row, start_col, end_row, end_col, clue, font_size = clue_box
+    x = start_col * cell_size
+    y = start_row * cell_size
+    box_width = (end_col - start_col + 1) * cell_size
+    box_height = (end_row - start_row + 1) * cell_size
+
+    # wrap and draw the clue text, lines always run across the box
+    wrapped_clue = wrap_text(clue, box_width, font_size=font_size, font_family=font_family)
+
+    clue_height = len(wrapped_clue) * font_size
+    vertical_offset = (box_height - clue_height) / 2 + font_size
+
+    return [dwg.text(line,
+                     insert=(x + box_width / 2, y + vertical_offset + (i * font_size)),
+                     text_anchor = "middle",
+                     font_size=font_size,
+                     font_family = font_family,
+                     fill='black')
+            for i, line in enumerate(wrapped_clue)]
+
+def element_id(kind, row, col):
+    """ id of the group holding one kind ('cell', 'letter', 'clue' or 'decor') of a cell in keyed drawings """
+    return f'{kind}-{row}-{col}'
+
+def clues_by_cell(puzzle):
+    # clue boxes grouped by start cell, boxes that start outside the grid under None
+    cells = {}
+    for box in puzzle.clue_boxes:
+        cell = box[:2] if puzzle.in_bounds(box[0], box[1]) else None
+        cells.setdefault(cell, []).append(box)
+    return cells
+
+def decorations_by_cell(puzzle):
+    # decorations grouped by cell, those outside the grid under None
+    cells = {}
+    for position, command in puzzle.decorations:
+        cell = alpha_to_index(position)
+        cells.setdefault(cell if puzzle.in_bounds(*cell) else None, []).append((position, command))
+    return cells
+
+def draw_fragment(dwg, puzzle, kind, row, col, cell_size=40, hide_words=False, clues=None, decorations=None):
+    """ the group with element_id(kind, row, col), always present even when empty
+
+    clues and decorations are the clues_by_cell()/decorations_by_cell() maps,
+    computed once by the caller when drawing many fragments.
+    """
+    group = dwg.g(id=element_id(kind, row, col))
+    if kind == 'cell':
+        rect = draw_cell(dwg, puzzle, row, col, cell_size)
+        if rect is not None:
+            group.add(rect)
+    elif kind == 'letter':
+        letter = None if hide_words else draw_letter(dwg, puzzle, row, col, cell_size)
+        if letter is not None:
+            group.add(letter)
+    elif kind == 'clue':
+        for box in (clues if clues is not None else clues_by_cell(puzzle)).get((row, col), ()):
+            for text in draw_clue(dwg, box, cell_size):
+                group.add(text)
+    elif kind == 'decor':
+        cell = (decorations if decorations is not None else decorations_by_cell(puzzle)).get((row, col), ())
+        draw_decorations(_GroupTarget(dwg, group), cell, cell_size)
+    else:
+        raise ValueError(f"Unknown fragment kind: {kind}")
+    return group
+
+def draw_puzzle(puzzle, filename=None, hide_words=False, cell_size=40, backend='svgwrite', compact=False, keyed=False, min_uses=2):
+    """ draw the puzzle, keyed=True wraps every cell's parts in groups with stable ids for patching
+
+    compact=True places decoration types used at least min_uses times as <symbol>s.
+    """
+    # calculate size of the grid
+    num_rows = puzzle.rows
+    num_cols = puzzle.cols
+
+    # create an svg drawing object, svgwrite is the reference, 'fast' builds the same svg from strings
+    if backend == 'fast':
+        dwg = svgfast.Drawing(filename, profile='full', size=(cell_size * num_cols, cell_size * num_rows))
+        words_layer = dwg.layer(label="Words", locked=False)
+    elif backend == 'svgwrite':
+        import svgwrite
+        from svgwrite.extensions import Inkscape
+        dwg = svgwrite.Drawing(filename, profile='full', size=(cell_size * num_cols, cell_size * num_rows))
+        inkscape = Inkscape(dwg)
+        words_layer = inkscape.layer(label="Words", locked=False)
+    else:
+        raise ValueError(f"Unknown svg backend: {backend}")
+    if keyed and compact:
+        raise ValueError("Keyed drawings can not be compact")
 
     dwg.defs.add(dwg.style(f'@import url(\'https://fonts.googleapis.com/css2?family={font_family}&display=swap\');'))
 
-    # draw the grid and fill in the letters
-    for row in range(num_rows):
-        for col in range(num_cols):
-            if(row, col) in merged_cells:
-                continue # skip merged cells
-            x = col*cell_size
-            y = row*cell_size
-
-            fill_color = highlightcolor if (row, col) in highlighted_indices else 'white'
-
-            # Check if the current cell is part of a clue box
-            is_clue_box = False
-            box_width = cell_size
-            box_height = cell_size
-
-            for start_row, start_col, end_row, end_col, _, _ in clue_boxes:
-                if start_row == row and start_col <= col <= end_col and start_row == end_row:
-                    is_clue_box = True
-                    box_width = (end_col - start_col + 1) * cell_size
-                    box_height = cell_size # Horizontal clue box
-                    break
-                elif start_col == col and start_row <= row <= end_row and start_col == end_col:
-                    is_clue_box = True
-                    box_width = cell_size # Vertical clue box
-                    box_height = (end_row - start_row + 1) * cell_size
-                    break
-
-            # Draw rectangle for clue box cells
-            dwg.add(dwg.rect(insert=(x, y), size=(box_width, box_height), fill=fill_color, stroke='black'))
-            # if the cell contains a letter, add the letter text, if not hidden
-            if not hide_words:
-                if grid[row][col] != '':
-                    words_layer.add(dwg.text(
-                        grid[row][col],
-                        insert=(x + cell_size/2, y + cell_size/2 + 10),
-                        text_anchor="middle",
-                        font_size=30,
-                        font_family=font_family,
-                        fill='black'
-                    ))
+    if keyed:
+        with profiling.stage('keyed'):
+            draw_keyed(dwg, words_layer, puzzle, hide_words, cell_size)
+    else:
+        # counted locally, handed to the profile (if any) once per stage
+        rects = texts = 0
+        with profiling.stage('cells'):
+            # draw the grid and fill in the letters
+            for row in range(num_rows):
+                for col in range(num_cols):
+                    rect = draw_cell(dwg, puzzle, row, col, cell_size)
+                    if rect is None:
+                        continue # skip merged cells
+                    dwg.add(rect)
+                    rects += 1
+                    # if the cell contains a letter, add the letter text, if not hidden
+                    if not hide_words:
+                        letter = draw_letter(dwg, puzzle, row, col, cell_size)
+                        if letter is not None:
+                            words_layer.add(letter)
+                            texts += 1
 
+            dwg.add(words_layer)
+
+        with profiling.stage('clues'):
+            # draw clue boxes and wrap text in them
+            for clue_box in puzzle.clue_boxes:
+                for text in draw_clue(dwg, clue_box, cell_size):
+                    dwg.add(text)
+                    texts += 1
+
+        with profiling.stage('decorations'):
+            if compact:
+                decorations = draw_decorations_compact(dwg, puzzle.decorations, cell_size, min_uses)
+            else:
+                decorations = draw_decorations(dwg, puzzle.decorations, cell_size)
+        profiling.count('rects', rects)
+        profiling.count('texts', texts)
+        profiling.count('decorations', decorations)
+
+    # render_both() empties this layer to derive the blank puzzle
+    dwg.words_layer = words_layer
+
+    if filename:
+        with profiling.stage('serialize'):
+            dwg.save()
+        profiling.count('bytes', os.path.getsize(filename))
+    return dwg
+
+def draw_keyed(dwg, words_layer, puzzle, hide_words=False, cell_size=40):
+    # same layers in the same order as a plain drawing, one group per cell and kind
+    clues = clues_by_cell(puzzle)
+    decorations = decorations_by_cell(puzzle)
+    cells = [(row, col) for row in range(puzzle.rows) for col in range(puzzle.cols)]
+    for row, col in cells:
+        dwg.add(draw_fragment(dwg, puzzle, 'cell', row, col, cell_size))
+    for row, col in cells:
+        words_layer.add(draw_fragment(dwg, puzzle, 'letter', row, col, cell_size, hide_words=hide_words))
     dwg.add(words_layer)
+    for row, col in cells:
+        dwg.add(draw_fragment(dwg, puzzle, 'clue', row, col, cell_size, clues=clues))
+    # anything outside the grid is drawn as it is, changes to it need a full render
+    for clue_box in clues.get(None, ()):
+        for text in draw_clue(dwg, clue_box, cell_size):
+            dwg.add(text)
+    for row, col in cells:
+        dwg.add(draw_fragment(dwg, puzzle, 'decor', row, col, cell_size, decorations=decorations))
+    draw_decorations(dwg, decorations.get(None, ()), cell_size)
 
-    # draw clue boxes and wrap text in them
-    for(start_row, start_col, end_row, end_col, clue, font_size) in clue_boxes:
-        x = start_col * cell_size
-        y = start_row * cell_size
-        box_width = (end_col - start_col + 1) * cell_size
-        box_height = (end_row - start_row + 1) * cell_size
+def build_puzzle(content, check=True):
+    """ parse the combined input text into the Puzzle that draw_puzzle needs
 
-        fill_color = 'white'
-#        dwg.add(dwg.rect(insert=(x,y), size=(box_width, box_height), fill=fill_color, stroke='black'))
-        # wrap and draw the clue text
-        if start_row == end_row:
-            wrapped_clue = wrap_text(clue, box_width, font_size=font_size)
+    With check the layout is validated first (validate.check) and its errors
+    are raised as an InputError, before any drawing is done.
+    """
+    with profiling.stage('parse'):
+        puzzle_input = parse_input(content)
+    with profiling.stage('build'):
+        puzzle = Puzzle.from_input(puzzle_input)
+    if check:
+        import validate
+        with profiling.stage('check'):
+            errors = validate.check(puzzle, puzzle_input.lines).errors
+        if errors:
+            raise InputError(errors)
+    return puzzle
+
+def drawing_to_string(dwg):
+    # same bytes as dwg.save(), but kept in memory
+    with profiling.stage('serialize'):
+        buffer = io.StringIO()
+        dwg.write(buffer)
+        svg = buffer.getvalue()
+    if profiling.current() is not None:
+        profiling.count('bytes', len(svg.encode('utf-8')))
+    return svg
+
+def render_svg(content, hide_words=False, cell_size=40, backend='svgwrite', compact=False):
+    """ render the combined input text to an svg string, without touching the disk """
+    dwg = draw_puzzle(build_puzzle(content), hide_words=hide_words, cell_size=cell_size, backend=backend, compact=compact)
+    return drawing_to_string(dwg)
+
+def render_keyed(content, hide_words=False, cell_size=40, backend='svgwrite'):
+    """ the keyed svg of the combined input text, see draw_puzzle(keyed=True) """
+    dwg = draw_puzzle(build_puzzle(content), hide_words=hide_words, cell_size=cell_size, backend=backend, keyed=True)
+    return drawing_to_string(dwg)
+
+def render_both(content, cell_size=40, backend='svgwrite', compact=False):
+    """ render the solution (facit) and the blank puzzle from one layout pass
+
+    The blank puzzle is the facit drawing with an empty words layer, which is
+    exactly what hide_words=True produces.
+    """
+    return draw_both(build_puzzle(content), cell_size=cell_size, backend=backend, compact=compact)
+
+def draw_both(puzzle, cell_size=40, backend='svgwrite', compact=False):
+    """ the facit and blank svg strings of a Puzzle, see render_both """
+    dwg = draw_puzzle(puzzle, hide_words=False, cell_size=cell_size, backend=backend, compact=compact)
+    facit = drawing_to_string(dwg)
+    dwg.words_layer.elements.clear()
+    blank = drawing_to_string(dwg)
+    return facit, blank
+
+def output_paths(input_file, output_dir=None):
+    """ the blank puzzle and solution files for an input file """
+    base = os.path.splitext(input_file)[0]
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return base + '.svg', base + '_facit.svg'
+
+def render_file(input_file, output_dir=None, cache_dir=None, **options):
+    """ render one input file to its .svg and _facit.svg, return both output paths """
+    with open(input_file, 'r', encoding='utf-8') as file:
+        content = file.read()
+
+    if cache_dir:
+        from render_cache import RenderCache
+        render = RenderCache(directory=cache_dir).render_both
+    else:
+        render = render_both
+
+    # render before opening the outputs so a failure leaves no empty files behind
+    facit, blank = render(content, **options)
+    output_file, output_file_facit = output_paths(input_file, output_dir)
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write(blank)
+    with open(output_file_facit, 'w', encoding='utf-8') as file:
+        file.write(facit)
+    return output_file, output_file_facit
+
+def fill_file(input_file, word_list, time_budget=10.0, seed=None, attempts=1, jobs=1, output_dir=None, **options):
+    """ fill the empty slots of an input file's layout from word_list and render the result
+
+    With attempts > 1 differently seeded attempts run on jobs worker
+    processes and the first complete fill wins. word_list may also be an
+    index from --build-index, which is used as well when it sits next to the
+    list as word_list + '.idx'.
+    """
+    import fill
+    import wordindex
+
+    with open(input_file, 'r', encoding='utf-8') as file:
+        puzzle = build_puzzle(file.read())
+    index = word_list + wordindex.INDEX_SUFFIX
+    if os.path.exists(index) and not wordindex.is_index(word_list):
+        try:
+            wordindex.WordIndex(index).close()
+        except wordindex.StaleIndex as e:
+            print(f"{e}; indexing {word_list} instead.", file=sys.stderr)
+    if attempts > 1:
+        result = fill.fill_parallel(puzzle, word_list, attempts=attempts, workers=jobs, time_budget=time_budget,
+                                    seed=seed or 0)
+    else:
+        result = fill.fill(puzzle, wordindex.load_words(word_list), time_budget=time_budget, seed=seed)
+    for row in result.puzzle.grid():
+        print(''.join(letter or '.' for letter in row))
+    stats = result.stats
+    outcome = 'complete' if result.complete else ('timed out' if stats['timed_out'] else 'no complete fill')
+    print(f"Filled {stats['filled']} of {stats['slots']} slots ({outcome}) in {stats['seconds']:.2f}s, "
+          f"{stats['nodes']} nodes, {stats['backtracks']} backtracks.", file=sys.stderr)
+    if 'attempt' in stats:
+        seed = 'best score first' if stats['seed'] is None else f"seed {stats['seed']}"
+        print(f"Attempt {stats['attempt'] + 1} of {stats['attempts']} won ({seed}).", file=sys.stderr)
+
+    facit, blank = draw_both(result.puzzle, **options)
+    output_file, output_file_facit = output_paths(input_file, output_dir)
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write(blank)
+    with open(output_file_facit, 'w', encoding='utf-8') as file:
+        file.write(facit)
+    return 0 if result.complete else 1
+
+def check_files(input_files):
+    """ print the layout errors and warnings of every input file, return 1 if any has errors """
+    import validate
+
+    failed = 0
+    for input_file in input_files:
+        try:
+            with open(input_file, 'r', encoding='utf-8') as file:
+                puzzle_input = parse_input(file)
+        except InputError as e:
+            errors, warnings = e.errors, []
         else:
-            wrapped_clue = wrap_text(clue, box_height, font_size=font_size)
+            report = validate.check(Puzzle.from_input(puzzle_input), puzzle_input.lines, puzzle_input.highlights)
+            errors, warnings = report.errors, report.warnings
+        for kind, problems in (('error', errors), ('warning', warnings)):
+            for line, column, message in sorted(problems):
+                print(f"{input_file}:{line}:{column}: {kind}: {message}")
+        failed += bool(errors)
+    print(f"Checked {len(input_files)} puzzles, {failed} with errors.", file=sys.stderr)
+    return 1 if failed else 0
 
-        clue_height = len(wrapped_clue) * font_size
-        vertical_offset = (box_height - clue_height) / 2 + font_size
+def collect_inputs(sources, manifest=None):
+    """ expand directories (*.txt), glob patterns and a manifest file into input files """
+    sources = list(sources)
+    if manifest:
+        # manifest entries are relative to the manifest itself
+        base = os.path.dirname(manifest)
+        with open(manifest, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    sources.append(os.path.join(base, line))
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            files.extend(sorted(glob.glob(os.path.join(source, '*.txt'))))
+        elif any(ch in source for ch in '*?['):
+            files.extend(sorted(glob.glob(source)))
+        else:
+            files.append(source)
+    # keep the order, drop duplicates
+    return list(dict.fromkeys(files))
 
-        for i, line in enumerate(wrapped_clue):
-            dwg.add(dwg.text(line,
-                             insert=(x + box_width / 2, y + vertical_offset + (i * font_size)),
-                             text_anchor = "middle",
-                             font_size=font_size,
-                             font_family = font_family,
-                             fill='black'))
+def _render_batch_item(input_file, options, profile=False):
+    # runs in a worker process, errors are reported instead of raised
+    start = time.perf_counter()
+    outputs = error = None
+    with profiling.profile() if profile else nullcontext() as active:
+        try:
+            outputs = render_file(input_file, **options)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    result = {'input': input_file, 'outputs': outputs, 'seconds': round(time.perf_counter() - start, 4), 'error': error}
+    if profile:
+        result['profile'] = active.to_dict()
+    return result
 
-    for position, command in decorations:
-        if command == 'CR':
-            draw_continuer(dwg, position)
-        elif command == 'CD':
-            draw_continued(dwg, position)
-        elif command == 'CL':
-            draw_continuel(dwg, position)
-        elif command == 'AR':
-            draw_arrowright(dwg, position)
-        elif command == 'AD':
-            draw_arrowdown(dwg, position)
-        elif command == 'AU':
-            draw_arrowup(dwg, position)
-        elif command == 'RR':
-            draw_arrowrr(dwg, position)
-        elif command == 'RD':
-            draw_arrowrd(dwg, position)
-        elif command == 'UR':
-            draw_arrowur(dwg, position)
-        elif command == 'DR':
-            draw_arrowdr(dwg, position)
-        elif command == 'TR':
-            draw_trir(dwg, position)
-        elif command == 'TD':
-            draw_trid(dwg, position)
-        elif command == 'C':
-            draw_copyright(dwg, position)
-        elif command == 'DH':
-            draw_dividerh(dwg, position)
-        elif command == 'DV':
-            draw_dividerv(dwg, position)
-        elif command == 'LH':
-            draw_lineh(dwg, position)
-        elif command == 'BRD':
-            draw_brd(dwg, position)
-        elif command == 'BR':
-            draw_br(dwg, position)
-        elif command == 'BUR':
-            draw_bur(dwg, position)
-        elif command == 'DH2':
-            draw_dh2(dwg, position)
-        elif command == 'DH3':
-            draw_dh3(dwg, position)
-        elif command == 'DH4':
-            draw_dh4(dwg, position)
-
-    dwg.save()
+def render_batch(files, jobs=1, profile=False, **options):
+    """ render many input files, with jobs > 1 across a process pool; one result dict per file
+
+    With profile every result has the stage times and counters of its render.
+    """
+    if jobs <= 1 or len(files) <= 1:
+        return [_render_batch_item(input_file, options, profile) for input_file in files]
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_render_batch_item, input_file, options, profile): input_file for input_file in files}
+        for future in as_completed(futures):
+            input_file = futures[future]
+            try:
+                results[input_file] = future.result()
+            except Exception as e: # the worker itself died
+                results[input_file] = {'input': input_file, 'outputs': None, 'seconds': None, 'error': f"{type(e).__name__}: {e}"}
+    return [results[input_file] for input_file in files]
+
+def export_outputs(outputs, pdf=None, png=False, dpi=300, font_file=None):
+    """ print exports of rendered (blank, facit) svg file pairs
+
+    png writes a .png next to every svg. pdf is a file that gets every blank
+    puzzle as a page, followed by every solution; pages are read and
+    rasterized one at a time. font_file outlines the text, see export.py.
+    """
+    import export
+
+    def read(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read()
+
+    if png:
+        for pair in outputs:
+            for path in pair:
+                with open(os.path.splitext(path)[0] + '.png', 'wb') as file:
+                    file.write(export.to_png(read(path), dpi=dpi, font_file=font_file))
+    if pdf:
+        pages = (read(pair[side]) for side in (0, 1) for pair in outputs)
+        count = export.write_pdf(pages, pdf, font_file=font_file)
+        print(f"Wrote {count} pages to {pdf}.")
+
+def make_book(files, book_file, columns=2, rows=None, font_file=None):
+    """ write the puzzle book of files to book_file, an svg or, by its extension, a pdf with one page per book page """
+    import book
+
+    if book_file.lower().endswith('.pdf'):
+        import export
+        count = export.write_pdf(book.pages(files, columns, rows), book_file, font_file=font_file)
+    else:
+        count = book.write_book(files, book_file, columns, rows)
+    print(f"Wrote {len(files)} puzzles on {count} pages to {book_file}.")
+    return 0
+
+def run_batch(files, jobs, report_file=None, exports=None, profile=False, **options):
+    """ render files on jobs processes, print a summary and return the exit code; exports holds export_outputs options """
+    start = time.perf_counter()
+    results = render_batch(files, jobs=jobs, profile=profile, **options)
+    failed = [result for result in results if result['error']]
+    report = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'jobs': jobs,
+        'total': len(results),
+        'failed': len(failed),
+        'seconds': round(time.perf_counter() - start, 4),
+        'puzzles': results,
+    }
+    for result in failed:
+        print(f"{result['input']}: {result['error']}", file=sys.stderr)
+    print(f"Rendered {len(results) - len(failed)} of {len(results)} puzzles in {report['seconds']:.2f}s ({len(failed)} failed).")
+    if profile:
+        # summed over all workers, so the total can exceed the wall clock time
+        total = profiling.Profile()
+        for result in results:
+            if 'profile' in result:
+                total.merge(result['profile'])
+        print(total.format(), file=sys.stderr)
+    if report_file:
+        import json
+        with open(report_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if exports:
+        export_outputs([result['outputs'] for result in results if not result['error']], **exports)
+    return 1 if failed else 0
+
+def load_backend(backend='svgwrite'):
+    """ import an svg backend ahead of the first render, e.g. before worker processes are forked """
+    if backend == 'svgwrite':
+        import svgwrite.extensions
+
+def serve(options, profile=False, requests=None, responses=None):
+    """ render the input file named on each line of requests (stdin) in this process
+
+    Every file is answered with one JSON line on responses (stdout) like a
+    --batch report entry, so a caller can keep one warm process instead of
+    paying for a new interpreter per puzzle. Ends at end of input.
+    """
+    import json
+    requests = requests or sys.stdin
+    responses = responses or sys.stdout
+    load_backend(options.get('backend', 'svgwrite'))
+    for line in requests:
+        input_file = line.strip()
+        if input_file:
+            responses.write(json.dumps(_render_batch_item(input_file, options, profile)) + '\n')
+            responses.flush()
+    return 0
+
+def run_profiled(run, profile=False, profiler=None, profile_output=None):
+    """ call run() and print its stage times (profile) and/or a cProfile/pyinstrument report (profiler) """
+    if profiler:
+        plain = run
+        run = lambda: profiling.run_with_profiler(profiler, plain, profile_output)
+    if not profile:
+        return run()
+    with profiling.profile() as active:
+        result = run()
+    print(active.format(), file=sys.stderr)
+    return result
 
 def main():
+    import argparse
     parser = argparse.ArgumentParser(description='Generate a Swedish crossword SVG from a text file.')
-    parser.add_argument('input_file', help='The path to the input text file with words.')
+    parser.add_argument('input_file', nargs='*', help='The path to the input text file with words. With --batch also directories and glob patterns.')
+    parser.add_argument('--cache-dir', help='Reuse renders of identical input from this directory.')
+    parser.add_argument('--backend', choices=['svgwrite', 'fast'], default='svgwrite',
+                        help='SVG writer, "fast" skips svgwrite and produces the same file.')
+    parser.add_argument('--compact', action='store_true',
+                        help='Define each decoration used more than once as a <symbol> and place it with <use>.')
+    parser.add_argument('--batch', action='store_true', help='Render many puzzles, see --manifest, --jobs and --report.')
+    parser.add_argument('--manifest', help='With --batch: a file listing input files, directories or globs, one per line.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='With --batch or --fill: number of worker processes.')
+    parser.add_argument('--font-file', help=f'TrueType/OpenType file with the metrics of the clue font ({font_family}), needs fontTools.')
+    parser.add_argument('--output-dir', help='Write the svg files here instead of next to the input.')
+    parser.add_argument('--report', help='With --batch: write a JSON summary with timings and failures to this file.')
+    parser.add_argument('--check', action='store_true',
+                        help='Only check the layouts (clue boxes, spans, arrows, unreachable cells) and list the problems.')
+    parser.add_argument('--fill', metavar='WORD_LIST', help='Fill the empty answer slots with words from this list (one word per line, optional score).')
+    parser.add_argument('--time-budget', type=float, default=10.0, help='With --fill: give up after this many seconds.')
+    parser.add_argument('--seed', type=int, help='With --fill: try candidates from a random point, reproducibly.')
+    parser.add_argument('--build-index', metavar='WORD_LIST',
+                        help='Compile a word list into WORD_LIST.idx, which --fill then opens without indexing it again.')
+    parser.add_argument('--attempts', type=int, default=1,
+                        help='With --fill: run this many seeded attempts on --jobs processes, the first complete fill wins.')
+    parser.add_argument('--pdf', metavar='PDF_FILE',
+                        help='Also write the puzzles to one PDF, all blank puzzles first and then the solutions. Needs cairosvg and pypdf.')
+    parser.add_argument('--png', action='store_true', help='Also write a PNG next to every SVG. Needs cairosvg.')
+    parser.add_argument('--dpi', type=int, default=300, help='With --png: resolution, the SVG is sized at 96 pixels to the inch.')
+    parser.add_argument('--outline-font', help='With --pdf/--png: draw text as outlines of this font file instead of --font-file.')
+    parser.add_argument('--serve', action='store_true',
+                        help='Stay running and render the input file named on each line of stdin, answering with a JSON line each.')
+    parser.add_argument('--book', metavar='BOOK_FILE',
+                        help='Lay out all input puzzles, then their solutions, on the pages of one SVG (or PDF, needs cairosvg and pypdf).')
+    parser.add_argument('--book-columns', type=int, default=2, help='With --book: puzzles side by side on a page.')
+    parser.add_argument('--book-rows', type=int, help='With --book: rows of puzzles per page, by default all puzzles on one page.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print the time spent in each render stage and the number of elements written, to stderr.')
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'],
+                        help='Run under a function level profiler and print its report, or write it to --profile-output.')
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help='With --profiler: write the report here (pstats file for cprofile, html for pyinstrument).')
 #    parser.add_argument('clue_file', help='The path to the input text file with clues.')
 #    parser.add_argument('highlight_file', help='The path to the input text file with highlights.')
 #    parser.add_argument('decorations_file', help='The path to the input text file with highlights.')
 
     args = parser.parse_args()
-    output_file = args.input_file.split('.')[0] + '.svg'
-    output_file_facit = args.input_file.split('.')[0] + '_facit.svg'
+    options = {'output_dir': args.output_dir, 'cache_dir': args.cache_dir, 'backend': args.backend, 'compact': args.compact}
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.font_file:
+        textmetrics.load_font_metrics(font_family, args.font_file)
+
+    if args.build_index:
+        import wordindex
+        start = time.perf_counter()
+        target, count = wordindex.build_index(args.build_index)
+        print(f"Indexed {count} words into {target} in {time.perf_counter() - start:.2f}s.")
+        return 0
+
+    if args.check:
+        files = collect_inputs(args.input_file, args.manifest)
+        if not files:
+            parser.error('no input files found')
+        return check_files(files)
+
+    if args.serve:
+        return serve(options, profile=args.profile)
+
+    if args.book:
+        files = collect_inputs(args.input_file, args.manifest)
+        if not files:
+            parser.error('no input files found')
+        if args.book.lower().endswith('.pdf'):
+            import export
+            if not export.available()['pdf']:
+                parser.error('a PDF book needs cairosvg and pypdf (pip install cairosvg pypdf)')
+        import book
+        try:
+            return run_profiled(lambda: make_book(files, args.book, args.book_columns, args.book_rows, args.outline_font or args.font_file),
+                                args.profile, args.profiler, args.profile_output)
+        except book.BookError as e:
+            # every bad puzzle, in the same format as a single file; nothing was written
+            for input_file, error in e.failures:
+                for line, column, message in error.errors:
+                    print(f"{input_file}:{line}:{column}: error: {message}", file=sys.stderr)
+            return 1
+
+    exports = None
+    if args.pdf or args.png:
+        import export
+        if not export.available()['pdf' if args.pdf else 'png']:
+            parser.error('PNG export needs cairosvg, PDF export cairosvg and pypdf (pip install cairosvg pypdf)')
+        exports = {'pdf': args.pdf, 'png': args.png, 'dpi': args.dpi, 'font_file': args.outline_font or args.font_file}
+
+    if args.batch:
+        files = collect_inputs(args.input_file, args.manifest)
+        if not files:
+            parser.error('no input files found')
+        # batch profiles are collected per file in the workers
+        return run_profiled(lambda: run_batch(files, args.jobs, report_file=args.report, exports=exports, profile=args.profile, **options),
+                            profiler=args.profiler, profile_output=args.profile_output)
+
+    if len(args.input_file) != 1:
+        parser.error('expected exactly one input file, use --batch for more')
 
  #   words = read_words_from_file(args.input_file)
  #   clues_with_positions = read_clues_from_file(args.clue_file)
  #   highlighted_positions = read_highlights(args.highlight_file)
  #   decorations = read_decorations(args.decorations_file)
 
-    words, clues_with_positions, highlighted_positions, decorations = read_input(args.input_file)
-    grid = create_grid_from_words(words)
-    max_grid_size = max(len(grid), len(grid[0]))
-    clue_grid, merged_cells, clue_boxes = create_clue_grid(clues_with_positions, max_grid_size)
+    def run():
+        if args.fill:
+            del options['cache_dir']
+            return fill_file(args.input_file[0], args.fill, args.time_budget, args.seed, args.attempts, args.jobs, **options)
+        outputs = render_file(args.input_file[0], **options)
+        if exports:
+            export_outputs([outputs], **exports)
+    try:
+        return run_profiled(run, args.profile, args.profiler, args.profile_output)
+    except InputError as e:
+        # same format as --check, so editors can jump to the line
+        for line, column, message in e.errors:
+            print(f"{args.input_file[0]}:{line}:{column}: error: {message}", file=sys.stderr)
+        return 1
 
-    create_crossword(output_file_facit, grid, clue_grid, highlighted_positions, merged_cells, clue_boxes, decorations, hide_words = False)
-#    create_crossword(output_file, grid, clue_grid, highlighted_positions, merged_cells, clue_boxes, decorations, hide_words = True)
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Per-stage timers and element counters for the render pipeline.
+
+Code in korsord marks its stages with `with profiling.stage('parse'):` and
+counts what it emits with profiling.count('rects', n). Both do nothing
+unless a Profile is active in the current context (`with
+profiling.profile() as p:`), so normal renders pay one context variable
+lookup per stage. run_with_profiler() wraps a whole run in cProfile or, when
+installed, pyinstrument for function level detail.
+"""
+
+import contextvars
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# the stages in pipeline order, for printing
+STAGES = ('parse', 'build', 'check', 'cells', 'keyed', 'clues', 'decorations', 'serialize')
+
+_current = contextvars.ContextVar('korsord_profile', default=None)
+
+class Profile:
+    """ seconds per stage and counters of one or more renders """
+    __slots__ = ('stages', 'counters')
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, profile):
+        """ add a to_dict() of another profile, e.g. one sent back by a worker process """
+        for stage, ms in profile['stages_ms'].items():
+            self.add(stage, ms / 1000)
+        for name, value in profile['counters'].items():
+            self.count(name, value)
+
+    def to_dict(self):
+        return {
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in _ordered(self.stages)},
+            'counters': dict(self.counters),
+        }
+
+    def format(self):
+        """ a small table for the terminal """
+        total = sum(self.stages.values())
+        lines = [f"{'stage':<12} {'ms':>9} {'share':>6}"]
+        for stage, seconds in _ordered(self.stages):
+            share = seconds / total * 100 if total else 0
+            lines.append(f"{stage:<12} {seconds * 1000:>9.2f} {share:>5.1f}%")
+        lines.append(f"{'total':<12} {total * 1000:>9.2f}")
+        if self.counters:
+            lines.append(', '.join(f"{name} {value}" for name, value in sorted(self.counters.items())))
+        return '\n'.join(lines)
+
+def _ordered(stages):
+    known = [(stage, stages[stage]) for stage in STAGES if stage in stages]
+    return known + sorted((stage, seconds) for stage, seconds in stages.items() if stage not in STAGES)
+
+def current():
+    """ the active Profile, None when nothing is being profiled """
+    return _current.get()
+
+@contextmanager
+def profile():
+    """ make a new Profile active for the code in the with block """
+    active = Profile()
+    token = _current.set(active)
+    try:
+        yield active
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def stage(name):
+    active = _current.get()
+    if active is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        active.add(name, time.perf_counter() - start)
+
+def count(name, n=1):
+    active = _current.get()
+    if active is not None:
+        active.count(name, n)
+
+class Totals:
+    """ running totals of many profiles, e.g. all renders of the app """
+
+    def __init__(self):
+        self.renders = 0
+        self.stages = {}
+        self.slowest = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        # profile is a Profile.to_dict(), as it comes back from a worker process
+        with self._lock:
+            self.renders += 1
+            for stage, ms in profile['stages_ms'].items():
+                self.stages[stage] = self.stages.get(stage, 0.0) + ms
+                self.slowest[stage] = max(self.slowest.get(stage, 0.0), ms)
+            for name, value in profile['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            renders = self.renders
+            return {
+                'renders': renders,
+                'stages': {stage: {'total_ms': round(ms, 3), 'mean_ms': round(ms / renders, 3), 'max_ms': self.slowest[stage]}
+                           for stage, ms in _ordered(self.stages)},
+                'counters': dict(self.counters),
+            }
+
+def run_with_profiler(kind, fn, output=None):
+    """ call fn() under cProfile or pyinstrument and report where the time went
+
+    The report goes to output (a pstats file for cProfile, html for
+    pyinstrument) or, without output, to stderr. Returns fn's result.
+    """
+    if kind == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn)
+        finally:
+            if output:
+                profiler.dump_stats(output)
+            else:
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(25)
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError("The pyinstrument profiler needs pyinstrument (pip install pyinstrument).")
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return fn()
+        finally:
+            profiler.stop()
+            if output:
+                with open(output, 'w', encoding='utf-8') as file:
+                    file.write(profiler.output_html())
+            else:
+                print(profiler.output_text(), file=sys.stderr)
+    raise ValueError(f"Unknown profiler: {kind}")
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import korsord
+import textmetrics
+from fsutil import prune_directory, touch, write_atomic
+
+# bump when a change to korsord alters the svg for the same input, or
+# rejects input it used to render (3: layout checks, 4: decorations scale
+# with the cell size, 5: words are only split with a hyphen, 6: bar strokes
+# scale too, 7: compact mode draws codes used once in place)
+CACHE_VERSION = 7
+
+def cache_key(content, **options):
+    """ hash of the normalized puzzle text, the render options and what else goes into the svg
+
+    That is the clue font metrics, the registered decorations and the year
+    in the copyright box, so a plugin or New Year gives new keys (and ETags).
+    """
+    metrics = textmetrics.metrics_for(korsord.font_family).fingerprint
+    payload = json.dumps([CACHE_VERSION, metrics, korsord.decorations_fingerprint(), datetime.now().year,
+                          korsord.normalize_input(content), sorted(options.items())])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class RenderCache:
+    """ LRU cache of rendered svgs, bounded by entry count and total size in utf-8 bytes
+
+    An optional directory adds a second, persistent tier that is consulted on
+    memory misses and shared with other processes (the CLI, other workers).
+    It is bounded by max_disk_bytes: every write removes the least recently
+    used files beyond it.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, directory=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def render(self, content, hide_words=False, cell_size=40, backend='svgwrite', compact=False):
+        # both backends write the same svg, so the backend is not part of the key
+        key = cache_key(content, hide_words=hide_words, cell_size=cell_size, compact=compact)
+        svg = self.get(key)
+        if svg is None:
+            svg = korsord.render_svg(content, hide_words=hide_words, cell_size=cell_size, backend=backend, compact=compact)
+            self.put(key, svg)
+        return svg
+
+    def render_both(self, content, cell_size=40, backend='svgwrite', compact=False):
+        """ facit and blank svg, sharing entries with render(hide_words=False/True) """
+        both = self.get_both(content, cell_size=cell_size, compact=compact)
+        if both is None:
+            both = korsord.render_both(content, cell_size=cell_size, backend=backend, compact=compact)
+            self.put_both(content, both, cell_size=cell_size, compact=compact)
+        return both
+
+    def get_both(self, content, cell_size=40, compact=False):
+        """ cached (facit, blank), or None when either is missing """
+        facit = self.get(cache_key(content, hide_words=False, cell_size=cell_size, compact=compact))
+        blank = self.get(cache_key(content, hide_words=True, cell_size=cell_size, compact=compact)) if facit is not None else None
+        return (facit, blank) if blank is not None else None
+
+    def put_both(self, content, both, cell_size=40, compact=False):
+        facit, blank = both
+        self.put(cache_key(content, hide_words=False, cell_size=cell_size, compact=compact), facit)
+        self.put(cache_key(content, hide_words=True, cell_size=cell_size, compact=compact), blank)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        svg = self._read_disk(key)
+        with self._lock:
+            if svg is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, svg)
+        return svg
+
+    def put(self, key, svg):
+        with self._lock:
+            self._store(key, svg)
+        if self.directory:
+            write_atomic(self._path(key), svg.encode('utf-8'))
+            removed = prune_directory(self.directory, '.svg', max_bytes=self.max_disk_bytes)
+            with self._lock:
+                self.disk_evictions += removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_evictions': self.disk_evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def _store(self, key, svg):
+        # caller holds the lock, entries are (svg, size in utf-8 bytes)
+        size = len(svg.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (svg, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                svg = f.read().decode('utf-8')
+        except FileNotFoundError:
+            return None
+        touch(path)
+        return svg
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.svg')
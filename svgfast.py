@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal string-building stand-in for the parts of svgwrite that korsord uses.
+
+Elements are formatted straight into strings from cached per-signature
+templates, without per-attribute validation or an ElementTree round trip.
+The output is byte-identical to what svgwrite produces for the same calls:
+attributes sorted by name, values through str(), empty values dropped.
+"""
+
+import io
+
+XML_HEADER = '<?xml version="1.0" encoding="utf-8" ?>\n'
+SVG_NAMESPACES = (
+    ('xmlns', 'http://www.w3.org/2000/svg'),
+    ('xmlns:ev', 'http://www.w3.org/2001/xml-events'),
+    ('xmlns:xlink', 'http://www.w3.org/1999/xlink'),
+)
+INKSCAPE_NAMESPACES = (
+    ('xmlns:inkscape', 'http://www.inkscape.org/namespaces/inkscape'),
+    ('xmlns:sodipodi', 'http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd'),
+)
+
+_templates = {}
+
+def escape_text(text):
+    # same escaping as ElementTree uses for character data
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+def escape_attribute(value):
+    # same escaping as ElementTree uses for attribute values
+    value = escape_text(value)
+    if '"' in value:
+        value = value.replace('"', '&quot;')
+    if '\r' in value:
+        value = value.replace('\r', '&#13;')
+    if '\n' in value:
+        value = value.replace('\n', '&#10;')
+    if '\t' in value:
+        value = value.replace('\t', '&#09;')
+    return value
+
+def attribute_name(key):
+    # svgwrite keyword rules: stroke_width -> stroke-width, class_ -> class
+    return key.rstrip('_').replace('_', '-')
+
+def attribute_string(attribs):
+    """ format a dict of svg attributes, sorted by name like svgwrite does """
+    keys = tuple(attribs)
+    template = _templates.get(keys)
+    if template is None:
+        names = sorted((attribute_name(key), key) for key in keys)
+        template = [(' %s="' % name, key) for name, key in names]
+        _templates[keys] = template
+    parts = []
+    for prefix, key in template:
+        value = attribs[key]
+        if value is None:
+            continue
+        value = value if isinstance(value, str) else str(value)
+        if value:
+            parts.append(prefix)
+            parts.append(escape_attribute(value))
+            parts.append('"')
+    return ''.join(parts)
+
+def element(name, attribs, text=None):
+    if text:
+        return '<%s%s>%s</%s>' % (name, attribute_string(attribs), escape_text(text), name)
+    return '<%s%s />' % (name, attribute_string(attribs))
+
+def points_to_string(points):
+    return ' '.join('%s,%s' % (x, y) for x, y in points)
+
+class Group:
+    """ container whose children are pre-formatted strings """
+
+    elementname = 'g'
+
+    def __init__(self, **attribs):
+        self.attribs = attribs
+        self.elements = []
+
+    def add(self, element):
+        self.elements.append(element)
+        return element
+
+    def __setitem__(self, key, value):
+        self.attribs[key] = value
+
+    def tostring(self):
+        name = self.elementname
+        if not self.elements:
+            return element(name, self.attribs)
+        return '<%s%s>%s</%s>' % (name, attribute_string(self.attribs), ''.join(self.tostrings(self.elements)), name)
+
+    @staticmethod
+    def tostrings(elements):
+        for child in elements:
+            yield child if isinstance(child, str) else child.tostring()
+
+class Symbol(Group):
+
+    elementname = 'symbol'
+
+class Defs(Group):
+
+    def tostring(self):
+        if not self.elements:
+            return '<defs />'
+        return '<defs>%s</defs>' % ''.join(self.tostrings(self.elements))
+
+class Drawing(Group):
+    """ drop-in for svgwrite.Drawing covering the elements korsord draws """
+
+    def __init__(self, filename='noname.svg', size=('100%', '100%'), profile='full'):
+        super().__init__()
+        self.filename = filename
+        self.size = size
+        self.profile = profile
+        self.inkscape = False
+        self.defs = Defs()
+
+    def layer(self, label=None, locked=False):
+        """ inkscape layer, the same as svgwrite.extensions.Inkscape(dwg).layer() """
+        self.inkscape = True
+        layer = Group(**{'inkscape:groupmode': 'layer'})
+        if label is not None:
+            layer['inkscape:label'] = label
+        if locked:
+            layer['sodipodi:insensitive'] = 1
+        return layer
+
+    def g(self, **attribs):
+        return Group(**attribs)
+
+    def symbol(self, **attribs):
+        return Symbol(**attribs)
+
+    def use(self, href, insert, **extra):
+        extra['xlink:href'] = href
+        extra['x'], extra['y'] = insert
+        return element('use', extra)
+
+    def rect(self, insert, size, **extra):
+        extra['x'], extra['y'] = insert
+        extra['width'], extra['height'] = size
+        return element('rect', extra)
+
+    def line(self, start, end, **extra):
+        extra['x1'], extra['y1'] = start
+        extra['x2'], extra['y2'] = end
+        return element('line', extra)
+
+    def polygon(self, points, **extra):
+        extra['points'] = points_to_string(points)
+        return element('polygon', extra)
+
+    def text(self, text, insert, **extra):
+        extra['x'], extra['y'] = insert
+        return element('text', extra, str(text))
+
+    def style(self, content):
+        return '<style type="text/css"><![CDATA[%s]]></style>' % content
+
+    def tostring(self):
+        attribs = {
+            'baseProfile': self.profile,
+            'version': '1.1',
+            'width': self.size[0],
+            'height': self.size[1],
+        }
+        attribs.update(SVG_NAMESPACES)
+        if self.inkscape:
+            attribs.update(INKSCAPE_NAMESPACES)
+        body = ''.join(self.tostrings(self.elements))
+        return '<svg%s>%s%s</svg>' % (attribute_string(attribs), self.defs.tostring(), body)
+
+    def write(self, fileobj):
+        fileobj.write(XML_HEADER)
+        fileobj.write(self.tostring())
+
+    def save(self):
+        with io.open(self.filename, mode='w', encoding='utf-8') as fileobj:
+            self.write(fileobj)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+The 'fast' string backend must write exactly the same svg as the svgwrite
+reference backend, for every option and every decoration.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import korsord  # noqa: E402
+
+# markup characters, quotes, multi-line and long clues; breaks the layout rules on purpose
+CONFORMANCE_INPUT = """ÅSA & <B>
+ "Q"  X
+
+A1H1 10 A & B <C>\\n\\n"quoted" clue
+B2V2 12 LONG VERTICAL CLUE TEXT
+C2H2 9 TWO\\nLINES
+
+A2
+B1
+
+A1 AR
+B2 RD
+C2 C
+D1 BRD
+D2 TR
+"""
+
+
+def decorations_input():
+    # one clue box per row in column A, each registered decoration next to it
+    codes = sorted(korsord.DECORATIONS)
+    words = '\n'.join(' ÄR' for _ in codes)
+    clues = '\n'.join(f'A{row + 1}H1 10 {code} CLUE' for row, code in enumerate(codes))
+    decorations = '\n'.join(f'B{row + 1} {code}' for row, code in enumerate(codes))
+    return korsord.join_sections(words, clues, 'B1', decorations)
+
+
+def synthetic_puzzle(rows, cols):
+    # clue boxes on every other cell of every other row, arrows into the rows between
+    puzzle = korsord.Puzzle(rows, cols)
+    for r in range(rows):
+        puzzle.set_row(r, [chr(ord('A') + (r + c) % 26) for c in range(cols)])
+    for r in range(0, rows, 2):
+        for c in range(0, cols, 2):
+            puzzle.set_letter(r, c, '')
+            puzzle.add_clue_box(r, c, r, c, 'CLUE', 10)
+            puzzle.decorations.append((f'{chr(ord("A") + c)}{r + 1}', 'AR' if r % 4 else 'RD'))
+    return puzzle
+
+
+PUZZLES = {
+    'conformance': lambda: korsord.build_puzzle(CONFORMANCE_INPUT, check=False),
+    'decorations': lambda: korsord.build_puzzle(decorations_input(), check=False),
+    'synthetic': lambda: synthetic_puzzle(12, 16),
+}
+
+OPTIONS = {
+    'default': {},
+    'hidden words': {'hide_words': True},
+    'compact': {'compact': True},
+    'compact, every code a symbol': {'compact': True, 'min_uses': 1},
+    'keyed': {'keyed': True},
+    'cell size 30': {'cell_size': 30},
+    'cell size 56, compact': {'cell_size': 56, 'compact': True},
+    'cell size 120': {'cell_size': 120},
+}
+
+
+def render(puzzle, backend, **options):
+    return korsord.drawing_to_string(korsord.draw_puzzle(puzzle, backend=backend, **options))
+
+
+@pytest.mark.parametrize('options', OPTIONS.values(), ids=list(OPTIONS))
+@pytest.mark.parametrize('name', PUZZLES)
+def test_fast_backend_matches_svgwrite(name, options):
+    puzzle = PUZZLES[name]()
+    assert render(puzzle, 'fast', **options) == render(puzzle, 'svgwrite', **options)
+
+
+def test_render_both_matches_svgwrite():
+    content = decorations_input()
+    assert korsord.render_both(content, backend='fast') == korsord.render_both(content, backend='svgwrite')
+
+
+@pytest.mark.parametrize('backend', ['svgwrite', 'fast'])
+def test_bar_strokes_scale_with_the_cell(backend):
+    puzzle = korsord.build_puzzle(korsord.join_sections(' ÄR', 'A1H1 10 CLUE', '', 'B1 BRD'))
+    assert 'stroke-width="4"' in render(puzzle, backend)
+    svg = render(puzzle, backend, cell_size=120)
+    assert 'stroke-width="12.0"' in svg and 'stroke-width="4"' not in svg
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Importing korsord must stay cheap: the heavy modules are imported where they
+are used. benchmarks/bench_startup.py has the detailed report.
+
+    python -m pytest tests
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# far above the ~20-30 ms measured, it only catches a heavy import at the top
+IMPORT_BUDGET_MS = 150
+
+
+def python(*args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+@pytest.mark.parametrize('module', ['svgwrite', 'argparse', 'json', 'concurrent.futures'])
+def test_import_korsord_skips_heavy_modules(module):
+    result = python('-c', f'import sys, korsord; print({module!r} in sys.modules)')
+    assert result.stdout.strip() == 'False'
+
+
+def test_import_korsord_within_budget():
+    # the best of three, a busy machine can slow down any single run
+    best = None
+    for _ in range(3):
+        result = python('-X', 'importtime', '-c', 'import korsord')
+        total = next(int(line.split('|')[1]) for line in reversed(result.stderr.splitlines())
+                     if line.split('|')[-1].strip() == 'korsord')
+        best = total if best is None else min(best, total)
+    assert best / 1000 < IMPORT_BUDGET_MS
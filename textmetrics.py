@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Glyph advance widths used to measure clue text.
+
+Real metrics for a font family are loaded from a font file with
+load_font_metrics(), which needs fontTools. Without an explicit file the
+first lookup of a family checks FONT_DIR, the fonts/ directory next to
+this module, for its regular face, e.g. fonts/Mogra-Regular.ttf. The
+installed system fonts are never searched, so the output does not depend
+on the host. Only when no file is found, or fontTools is missing, the
+built-in table is used: the Helvetica/Arial advance widths (1000 units
+per em) for the characters that turn up in clues, Swedish letters
+included.
+"""
+
+import hashlib
+import os
+import threading
+
+UNITS_PER_EM = 1000
+
+HELVETICA_WIDTHS = {
+    ' ': 278, '!': 278, '"': 355, '#': 556, '$': 556, '%': 889, '&': 667, "'": 191,
+    '(': 333, ')': 333, '*': 389, '+': 584, ',': 278, '-': 333, '.': 278, '/': 278,
+    '0': 556, '1': 556, '2': 556, '3': 556, '4': 556, '5': 556, '6': 556, '7': 556,
+    '8': 556, '9': 556, ':': 278, ';': 278, '<': 584, '=': 584, '>': 584, '?': 556,
+    '@': 1015, 'A': 667, 'B': 667, 'C': 722, 'D': 722, 'E': 667, 'F': 611, 'G': 778,
+    'H': 722, 'I': 278, 'J': 500, 'K': 667, 'L': 556, 'M': 833, 'N': 722, 'O': 778,
+    'P': 667, 'Q': 778, 'R': 722, 'S': 667, 'T': 611, 'U': 722, 'V': 667, 'W': 944,
+    'X': 667, 'Y': 667, 'Z': 611, '[': 278, '\\': 278, ']': 278, '^': 469, '_': 556,
+    '`': 333, 'a': 556, 'b': 556, 'c': 500, 'd': 556, 'e': 556, 'f': 278, 'g': 556,
+    'h': 556, 'i': 222, 'j': 222, 'k': 500, 'l': 222, 'm': 833, 'n': 556, 'o': 556,
+    'p': 556, 'q': 556, 'r': 333, 's': 500, 't': 278, 'u': 556, 'v': 500, 'w': 722,
+    'x': 500, 'y': 500, 'z': 500, '{': 334, '|': 260, '}': 334, '~': 584,
+    'Å': 667, 'Ä': 667, 'Ö': 778, 'É': 667, 'Ü': 722, 'Æ': 1000, 'Ø': 778,
+    'å': 556, 'ä': 556, 'ö': 556, 'é': 556, 'ü': 556, 'æ': 889, 'ø': 611,
+    '©': 737, '–': 556, '—': 1000, '’': 222, '‘': 222, '”': 333, '“': 333, '…': 1000,
+}
+# anything not in a table is measured as a wide capital
+DEFAULT_WIDTH = 722
+
+class FontMetrics:
+    __slots__ = ('widths', 'units_per_em', 'default_width', 'fingerprint')
+
+    def __init__(self, widths, units_per_em=UNITS_PER_EM, default_width=DEFAULT_WIDTH):
+        self.widths = widths
+        self.units_per_em = units_per_em
+        self.default_width = default_width
+        # identifies the table in render cache keys, since wrapping depends on it
+        table = repr((sorted(widths.items()), units_per_em, default_width))
+        self.fingerprint = hashlib.sha256(table.encode('utf-8')).hexdigest()[:16]
+
+    def text_width(self, text, font_size):
+        get = self.widths.get
+        default = self.default_width
+        return sum(get(ch, default) for ch in text) * font_size / self.units_per_em
+
+BUILTIN_METRICS = FontMetrics(HELVETICA_WIDTHS)
+
+# fonts shipped with the app, see find_font_file
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+FONT_NAMES = ('{}-Regular.ttf', '{}-Regular.otf', '{}.ttf', '{}.otf')
+
+_metrics = {}
+_searched = set()
+_lock = threading.Lock()
+_listeners = []
+
+def metrics_for(font_family):
+    """ the registered metrics of font_family, looked up in FONT_DIR the first time, else the built-in table """
+    metrics = _metrics.get(font_family)
+    if metrics is not None:
+        return metrics
+    if font_family and font_family not in _searched:
+        return _discover(font_family)
+    return BUILTIN_METRICS
+
+def _discover(font_family):
+    with _lock:
+        if font_family in _searched:
+            return _metrics.get(font_family, BUILTIN_METRICS)
+        _searched.add(font_family)
+    path = find_font_file(font_family)
+    if path is not None:
+        try:
+            return load_font_metrics(font_family, path)
+        except Exception:
+            pass # no fontTools or not a font it can read, measure with the built-in table
+    return BUILTIN_METRICS
+
+def find_font_file(font_family, directory=None):
+    """ the path of the family's regular face in directory (FONT_DIR), e.g. Mogra-Regular.ttf, or None """
+    # a few stat calls, no directory walk, so a cold start stays cheap
+    for pattern in FONT_NAMES:
+        path = os.path.join(directory or FONT_DIR, pattern.format(font_family.replace(' ', '')))
+        if os.path.isfile(path):
+            return path
+    return None
+
+def on_metrics_change(callback):
+    """ callback() runs whenever metrics are (re)registered, e.g. to drop caches """
+    _listeners.append(callback)
+
+def register_metrics(font_family, metrics):
+    with _lock:
+        _metrics[font_family] = metrics
+    for callback in _listeners:
+        callback()
+
+def load_font_metrics(font_family, path):
+    """ read advance widths for font_family from a TrueType/OpenType file """
+    try:
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        raise RuntimeError("Loading font metrics needs fontTools (pip install fonttools).")
+    font = TTFont(path, lazy=True)
+    advances = font['hmtx'].metrics
+    widths = {chr(code): advances[glyph][0] for code, glyph in font.getBestCmap().items() if glyph in advances}
+    units_per_em = font['head'].unitsPerEm
+    default_width = widths.get('M', units_per_em * DEFAULT_WIDTH // UNITS_PER_EM)
+    font.close()
+    metrics = FontMetrics(widths, units_per_em, default_width)
+    register_metrics(font_family, metrics)
+    return metrics
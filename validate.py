@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Layout checks that run before anything is drawn.
+
+check() finds the answer slots the arrows point at (korsord.find_slots) and
+then walks the clue boxes and the cells once, so a bad puzzle is reported in
+milliseconds instead of after a full render. Problems are (line, column,
+message) like korsord.InputError. Errors are layouts the renderer can't draw
+sensibly: clue boxes outside the grid, over each other or over letters.
+Warnings are likely mistakes: arrows that lead nowhere, letters and empty
+cells no arrow leads to, highlights and decorations outside the grid and
+columns past Z, which clues can't address.
+"""
+
+from collections import namedtuple
+
+import korsord
+
+Report = namedtuple('Report', 'errors warnings slots')
+
+# columns A-Z, the only ones a position like B3 can name
+MAX_COLUMNS = 26
+
+def cell_name(row, col):
+    if 0 <= col < MAX_COLUMNS:
+        return f'{chr(ord("A") + col)}{row + 1}'
+    return f'column {col + 1} of row {row + 1}'
+
+def check(puzzle, lines=None, highlights=()):
+    """ validate a Puzzle, return a Report
+
+    lines are PuzzleInput.lines, the input line of every word row, clue,
+    highlight and decoration; without them problems are reported on line 0.
+    highlights are the highlighted positions, which the Puzzle only keeps
+    when they are inside the grid.
+    """
+    lines = lines or ([], [], [], [])
+    def line(section, index):
+        return lines[section][index] if index < len(lines[section]) else 0
+
+    errors = []
+    warnings = []
+    rows, cols = puzzle.rows, puzzle.cols
+    letters = puzzle.letters
+    owners = puzzle.owners
+
+    if cols > MAX_COLUMNS:
+        row = next((row for row in range(rows) if any(letters[row * cols + MAX_COLUMNS:(row + 1) * cols])), 0)
+        warnings.append((line(0, row), MAX_COLUMNS + 1, f"the grid is {cols} columns wide, columns past Z can't be given clues, highlights or decorations"))
+
+    for index, (start_row, start_col, end_row, end_col, _, _) in enumerate(puzzle.clue_boxes):
+        number = line(1, index)
+        if not puzzle.in_bounds(start_row, start_col):
+            errors.append((number, 1, f"clue cell {cell_name(start_row, start_col)} is outside the {cols}x{rows} grid"))
+            continue
+        if not puzzle.in_bounds(end_row, end_col):
+            errors.append((number, 1, f"clue span from {cell_name(start_row, start_col)} runs off the grid edge"))
+        overlap = None
+        for row in range(start_row, min(end_row, rows - 1) + 1):
+            for col in range(start_col, min(end_col, cols - 1) + 1):
+                i = row * cols + col
+                if owners[i] != index:
+                    overlap = overlap or (row, col, owners[i])
+                elif letters[i]:
+                    errors.append((line(0, row), col + 1, f"letter '{chr(letters[i])}' at {cell_name(row, col)} is under the clue on line {number}"))
+        if overlap:
+            row, col, owner = overlap
+            errors.append((number, 1, f"clue box overlaps the clue on line {line(1, owner)} at {cell_name(row, col)}"))
+
+    for index, position in enumerate(highlights):
+        if not puzzle.in_bounds(*korsord.alpha_to_index(position)):
+            warnings.append((line(2, index), 1, f"highlight {position} is outside the grid"))
+    arrows = False
+    for index, (position, command) in enumerate(puzzle.decorations):
+        arrows = arrows or command in korsord.ARROWS
+        if command not in korsord.DECORATIONS:
+            warnings.append((line(3, index), 1, f"unknown decoration {command} at {position} is not drawn"))
+        elif not puzzle.in_bounds(*korsord.alpha_to_index(position)):
+            warnings.append((line(3, index), 1, f"decoration {command} at {position} is outside the grid"))
+
+    slots = korsord.find_slots(puzzle)
+    covered = bytearray(rows * cols)
+    for slot in slots:
+        if not slot.length:
+            target = 'off the grid' if not puzzle.in_bounds(slot.row, slot.col) else f'at the clue box in {cell_name(slot.row, slot.col)}'
+            warnings.append((line(3, slot.decoration), 1, f"arrow {puzzle.decorations[slot.decoration][1]} at {slot.position} points {target}"))
+            continue
+        start = slot.row * cols + slot.col
+        step = 1 if slot.direction == 'across' else cols
+        covered[start:start + slot.length * step:step] = b'\x01' * slot.length
+
+    # without arrows the layout doesn't say where the answers go, so there is nothing to be reachable from
+    if arrows:
+        cell_types = puzzle.cell_types
+        for row in range(rows):
+            orphans, unreachable = [], []
+            for col in range(cols):
+                i = row * cols + col
+                if cell_types[i] != korsord.OPEN or covered[i]:
+                    continue
+                (orphans if letters[i] else unreachable).append(col)
+            if orphans:
+                warnings.append((line(0, row), orphans[0] + 1, f"no arrow leads to the letters at {', '.join(cell_name(row, col) for col in orphans)}"))
+            if unreachable:
+                warnings.append((line(0, row), unreachable[0] + 1, f"no arrow leads to the empty cells {', '.join(cell_name(row, col) for col in unreachable)}"))
+
+    return Report(errors, warnings, slots)
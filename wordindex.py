@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Prebuilt binary index of a word list for the grid filler.
+
+Indexing a large list (fill.WordStore) takes seconds, on every start of
+korsord.py and in every worker process. build_index() does it once and
+writes the result to a file that WordIndex opens with mmap: word texts and
+scores are read straight from the mapping, and all processes that open the
+same file share its pages through the page cache. The index remembers the
+size and modification time of its source list so a stale one is noticed.
+
+Layout, all little endian:
+
+    header      magic, version, bucket count, source size, source mtime_ns,
+                length of the source path, then the path (utf-8)
+    buckets     per word length: length, word count and the offsets of its
+                word table, scores and letter tables
+    words       count + 1 uint32 offsets into the utf-8 text that follows
+    scores      count doubles, best first like WordStore
+    letters     the offset of each position's letter table, which holds the
+                number of letters and then (code point, offset) of each
+                letter's bitset of (count + 7) // 8 bytes
+"""
+
+import mmap
+import os
+import struct
+from array import array
+
+import fill
+from fsutil import write_atomic
+
+MAGIC = b'KORSWIDX'
+VERSION = 1
+INDEX_SUFFIX = '.idx'
+
+_HEADER = struct.Struct('<8sIIQqI')
+_BUCKET = struct.Struct('<IIQQQ')
+_COUNT = struct.Struct('<I')
+_LETTER = struct.Struct('<IQ')
+_OFFSET = struct.Struct('<Q')
+
+class StaleIndex(Exception):
+    """ raised when the source word list changed after the index was built """
+
+def _align(data):
+    data.extend(bytes(-len(data) % 8))
+
+def build_index(source, target=None):
+    """ index the word list at source (see fill.WordStore.from_file) into target, return target and the word count """
+    target = target or source + INDEX_SUFFIX
+    stat = os.stat(source)
+    store = fill.WordStore.from_file(source)
+    path = os.path.abspath(source).encode('utf-8')
+    lengths = sorted(store.words)
+
+    data = bytearray(_HEADER.pack(MAGIC, VERSION, len(lengths), stat.st_size, stat.st_mtime_ns, len(path)))
+    data += path
+    _align(data)
+    table = len(data)
+    data += bytes(_BUCKET.size * len(lengths))
+    _align(data)
+    for i, length in enumerate(lengths):
+        words = store.words[length]
+        count = len(words)
+        size = (count + 7) // 8
+
+        words_offset = len(data)
+        encoded = [word.encode('utf-8') for word in words]
+        offsets = array('I', [0])
+        for word in encoded:
+            offsets.append(offsets[-1] + len(word))
+        data += offsets.tobytes()
+        data += b''.join(encoded)
+        _align(data)
+
+        scores_offset = len(data)
+        data += array('d', store.scores[length]).tobytes()
+
+        letters_offset = len(data)
+        data += bytes(_OFFSET.size * length)
+        for position, masks in enumerate(store.masks[length]):
+            _OFFSET.pack_into(data, letters_offset + position * _OFFSET.size, len(data))
+            data += _COUNT.pack(len(masks))
+            entries = len(data)
+            data += bytes(_LETTER.size * len(masks))
+            for k, (letter, bits) in enumerate(sorted(masks.items())):
+                _LETTER.pack_into(data, entries + k * _LETTER.size, ord(letter), len(data))
+                data += bits.to_bytes(size, 'little')
+            _align(data)
+        _BUCKET.pack_into(data, table + i * _BUCKET.size, length, count, words_offset, scores_offset, letters_offset)
+
+    write_atomic(os.path.abspath(target), bytes(data))
+    return target, len(store)
+
+class WordIndex:
+    """ a build_index() file opened with mmap, with the lookups of fill.WordStore
+
+    Word texts and scores are read from the mapping without copying. A
+    letter bitset becomes a Python int the first time the search asks for
+    it, since that is what the search combines, and is kept for the next.
+    """
+
+    def __init__(self, path, check=True):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._data = memoryview(self._mmap)
+        if len(data) < _HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a word index")
+        magic, version, buckets, self.source_size, self.source_mtime_ns, path_length = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a word index (version {VERSION})")
+        self.source = bytes(data[_HEADER.size:_HEADER.size + path_length]).decode('utf-8')
+        if check and self.stale():
+            self.close()
+            raise StaleIndex(f"{path} is older than {self.source}, rebuild it with korsord.py --build-index {self.source}")
+
+        table = _HEADER.size + path_length + (-(_HEADER.size + path_length) % 8)
+        self._buckets = {}
+        for i in range(buckets):
+            length, count, words_offset, scores_offset, letters_offset = _BUCKET.unpack_from(data, table + i * _BUCKET.size)
+            offsets = data[words_offset:words_offset + 4 * (count + 1)].cast('I')
+            text = words_offset + 4 * (count + 1)
+            scores = data[scores_offset:scores_offset + 8 * count].cast('d')
+            self._buckets[length] = (count, offsets, text, scores, letters_offset)
+        self._letters = {}
+
+    def __reduce__(self):
+        # a process pool with spawn reopens the file instead of pickling the mapping
+        return (WordIndex, (self.path, False))
+
+    def stale(self):
+        """ True when the source list still exists and no longer matches the one indexed """
+        try:
+            stat = os.stat(self.source)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) != (self.source_size, self.source_mtime_ns)
+
+    def close(self):
+        self._buckets = self._letters = {}
+        self._data.release()
+        self._mmap.close()
+
+    def __len__(self):
+        return sum(bucket[0] for bucket in self._buckets.values())
+
+    def count(self, length):
+        bucket = self._buckets.get(length)
+        return bucket[0] if bucket else 0
+
+    def all(self, length):
+        """ bitset of every word of length """
+        return (1 << self.count(length)) - 1
+
+    def mask(self, length, position, letter):
+        """ bitset of the words of length with letter at position """
+        return self.letter_masks(length, position).get(letter, 0)
+
+    def letter_masks(self, length, position):
+        """ {letter: bitset} of the words of length by their letter at position """
+        masks = self._letters.get((length, position))
+        if masks is None:
+            masks = self._letters[(length, position)] = self._read_letters(length, position)
+        return masks
+
+    def _read_letters(self, length, position):
+        bucket = self._buckets.get(length)
+        if bucket is None or position >= length:
+            return {}
+        count, _, _, _, letters_offset = bucket
+        size = (count + 7) // 8
+        data = self._data
+        offset, = _OFFSET.unpack_from(data, letters_offset + position * _OFFSET.size)
+        letters, = _COUNT.unpack_from(data, offset)
+        masks = {}
+        for k in range(letters):
+            code, bits = _LETTER.unpack_from(data, offset + _COUNT.size + k * _LETTER.size)
+            masks[chr(code)] = int.from_bytes(data[bits:bits + size], 'little')
+        return masks
+
+    def word(self, length, index):
+        _, offsets, text, _, _ = self._buckets[length]
+        return str(self._data[text + offsets[index]:text + offsets[index + 1]], 'utf-8')
+
+    def score(self, length, index):
+        return self._buckets[length][3][index]
+
+def is_index(path):
+    try:
+        with open(path, 'rb') as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+# word lists this process already opened, by path and modification time
+_opened = {}
+
+def load_words(path):
+    """ the word store for path: an index file, the fresh index next to a word list, or the list itself
+
+    A plain list without a fresh path + '.idx' is indexed in memory, which
+    is slow for big lists. Every process opens each file once.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    store = _opened.get(key)
+    if store is None:
+        if is_index(path):
+            store = WordIndex(path)
+        else:
+            try:
+                store = WordIndex(path + INDEX_SUFFIX)
+            except (OSError, ValueError, StaleIndex):
+                store = fill.WordStore.from_file(path)
+        _opened[key] = store
+    return store